@@ -0,0 +1,5 @@
+"""Reusable building blocks behind the abalone_asm.py analysis.
+
+Submodules are imported explicitly (``from abalone import stream``) so that
+importing the package itself stays cheap.
+"""
@@ -0,0 +1,7 @@
+"""``python -m abalone``; see ``abalone.cli``."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
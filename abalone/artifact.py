@@ -0,0 +1,232 @@
+"""Binary model artifacts and an allocation-free prediction kernel.
+
+A fitted ``LinearAgeModel`` (with its cleaning statistics) is exported to
+a small little-endian file that is memory-mapped at startup:
+
+=========  ================================================================
+offset     content
+=========  ================================================================
+0          header, 64 bytes: magic ``ABALAGE\\0``, format version,
+           feature count, sex level count, training rows, names length
+64         float32 weights, one per feature
+           float32 intercept (the 1.5 year age offset included)
+           float32 sex effects for F, I, M and a trailing NaN for
+           unknown levels
+           float32 missing-value fills (means, medians for Length and
+           Diameter), then float32 medians for negative values
+end        feature names, UTF-8, newline separated
+=========  ================================================================
+
+``Kernel`` cleans and scores a contiguous float32 block in place through
+``out=`` arguments and scratch buffers sized once, so a call allocates no
+arrays.  ``predict_row`` scores a single specimen with plain float
+arithmetic on the constants, which is faster than any NumPy call for one
+row.
+
+    python -m abalone.artifact export model.json -o model.bin
+    python -m abalone.artifact info model.bin
+"""
+
+import argparse
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from .model import FEATURE_COLS
+from .predict import SEX_VALUES, BatchPredictor
+
+MAGIC = b'ABALAGE\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHHHxxQI')
+HEADER_SIZE = 64
+
+SEX_CODES = {sex: i for i, sex in enumerate(SEX_VALUES)}
+DEFAULT_MAX_BATCH = 4096
+
+
+def _layout(n_features, n_sex):
+    """(name, count) of the float32 arrays after the header, in order."""
+    return [('weights', n_features), ('intercept', 1),
+            ('sex_effects', n_sex + 1), ('fills', n_features),
+            ('medians', n_features)]
+
+
+def export(model, path):
+    """Write ``model`` (a ``LinearAgeModel`` with stats) to ``path``."""
+    predictor = BatchPredictor(model)
+    names = '\n'.join(FEATURE_COLS).encode()
+    arrays = {
+        'weights': predictor.weights,
+        'intercept': [predictor.intercept],
+        'sex_effects': [predictor.sex_effects[s] for s in SEX_VALUES] + [np.nan],
+        'fills': predictor.fills,
+        'medians': predictor.medians,
+    }
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(FEATURE_COLS),
+                         len(SEX_VALUES), model.n, len(names))
+    blocks = []
+    for name, count in _layout(len(FEATURE_COLS), len(SEX_VALUES)):
+        values = np.asarray(arrays[name], dtype='<f4')
+        if values.shape != (count,):
+            raise ValueError(f'{name}: expected {count} values, got shape '
+                             f'{values.shape}')
+        blocks.append(values.tobytes())
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.writelines(blocks)
+        f.write(names)
+    os.replace(tmp, path)
+    return path
+
+
+class ModelArtifact:
+    """Memory-mapped artifact; the arrays are read-only float32 views."""
+
+    def __init__(self, path):
+        self.path = path
+        self.buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self.buffer) < HEADER_SIZE:
+            raise ValueError(f'{path}: too short for a model artifact')
+        (magic, version, n_features, n_sex, self.rows,
+         names_len) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: not a model artifact')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'{path}: unsupported artifact version {version}')
+
+        offset = HEADER_SIZE
+        for name, count in _layout(n_features, n_sex):
+            view = np.frombuffer(self.buffer, dtype='<f4', count=count,
+                                 offset=offset)
+            setattr(self, name, view)
+            offset += 4 * count
+        names = bytes(self.buffer[offset:offset + names_len]).decode()
+        self.features = names.split('\n')
+        if self.features != FEATURE_COLS:
+            raise ValueError(f'{path}: features {self.features} do not match '
+                             f'{FEATURE_COLS}')
+
+        # Python floats for the single-row path
+        self._row_constants = tuple(zip(
+            self.weights.tolist(), self.fills.tolist(), self.medians.tolist()))
+        self._row_intercept = float(self.intercept[0])
+        self._row_sex = dict(zip(SEX_VALUES, self.sex_effects.tolist()))
+
+    def predict_row(self, values, sex):
+        """Age of one specimen from its seven measurements and ``Sex``."""
+        age = self._row_intercept + self._row_sex.get(sex, np.nan)
+        for value, (weight, fill, median) in zip(values, self._row_constants):
+            if value != value:
+                value = fill
+            elif value < 0:
+                value = median
+            age += weight * value
+        return age
+
+    def kernel(self, max_batch=DEFAULT_MAX_BATCH):
+        return Kernel(self, max_batch)
+
+
+class Kernel:
+    """Batch scorer over an artifact with preallocated scratch buffers.
+
+    ``predict_into`` takes a C-contiguous float32 block of shape
+    (n, features) with n <= ``max_batch``, repairs it in place (missing
+    values to the fills, negatives to the medians) and writes the ages to
+    ``out``.  ``sex_codes`` are integer codes 0, 1, 2 for F, I, M; -1
+    (pandas' code for an unknown category) or any other code gives NaN.
+    """
+
+    def __init__(self, artifact, max_batch=DEFAULT_MAX_BATCH):
+        self.artifact = artifact
+        self.max_batch = max_batch
+        n_features = len(artifact.weights)
+        self._mask = np.empty((max_batch, n_features), dtype=bool)
+        self._sex = np.empty(max_batch, dtype=np.float32)
+        self._codes = np.empty(max_batch, dtype=np.intp)
+        self._unknown = np.empty(max_batch, dtype=bool)
+        # Index of the trailing NaN sex effect
+        self._nan_code = len(artifact.sex_effects) - 1
+        self._fills = np.ascontiguousarray(artifact.fills)
+        self._medians = np.ascontiguousarray(artifact.medians)
+        self._weights = np.ascontiguousarray(artifact.weights)
+        self._intercept = artifact.intercept[0]
+
+    def predict_into(self, values, sex_codes, out):
+        n = len(values)
+        if n > self.max_batch:
+            raise ValueError(f'batch of {n} rows exceeds max_batch '
+                             f'{self.max_batch}')
+        mask, sex = self._mask[:n], self._sex[:n]
+        np.isnan(values, out=mask)
+        np.copyto(values, self._fills, where=mask)
+        np.less(values, 0, out=mask)
+        np.copyto(values, self._medians, where=mask)
+        np.dot(values, self._weights, out=out)
+        out += self._intercept
+        # Codes other than F, I, M (-1 or out of range) take the trailing
+        # NaN effect; viewed as unsigned, negative codes are out of range too
+        codes, unknown = self._codes[:n], self._unknown[:n]
+        np.copyto(codes, sex_codes, casting='same_kind')
+        np.greater(codes.view(np.uintp), self._nan_code - 1, out=unknown)
+        np.copyto(codes, self._nan_code, where=unknown)
+        np.take(self.artifact.sex_effects, codes, out=sex)
+        out += sex
+        return out
+
+    def predict(self, values, sex_codes):
+        """Convenience wrapper allocating the output; splits large blocks."""
+        values = np.array(values, dtype=np.float32, order='C')
+        out = np.empty(len(values), dtype=np.float32)
+        for start in range(0, len(values), self.max_batch):
+            rows = slice(start, start + self.max_batch)
+            self.predict_into(values[rows], sex_codes[rows], out[rows])
+        return out
+
+
+def sex_codes(sex):
+    """Integer codes (F=0, I=1, M=2, other=-1) of a sequence of Sex values."""
+    return np.array([SEX_CODES.get(s, -1) for s in sex], dtype=np.intp)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone.artifact',
+        description='Export and inspect binary age-model artifacts.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_p = sub.add_parser('export', help='model JSON -> binary artifact')
+    export_p.add_argument('model')
+    export_p.add_argument('-o', '--output', default='model.bin')
+    info_p = sub.add_parser('info', help='print an artifact')
+    info_p.add_argument('artifact')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        from .model import LinearAgeModel
+
+        export(LinearAgeModel.load(args.model), args.output)
+        print(f'{args.output}: {os.path.getsize(args.output)} bytes',
+              file=sys.stderr)
+        return 0
+
+    artifact = ModelArtifact(args.artifact)
+    print(f'{args.artifact}: format {FORMAT_VERSION}, '
+          f'{artifact.rows} training rows')
+    print(f'  intercept  {artifact.intercept[0]:.6g}')
+    for name, weight, fill, median in zip(
+            artifact.features, artifact.weights, artifact.fills,
+            artifact.medians):
+        print(f'  {name:<20} weight {weight:>10.4f}  fill {fill:.4f}  '
+              f'median {median:.4f}')
+    for sex, effect in zip(SEX_VALUES, artifact.sex_effects):
+        print(f'  Sex={sex:<16} effect {effect:>10.4f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
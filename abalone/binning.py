@@ -0,0 +1,137 @@
+"""Pre-binned aggregates for plotting large datasets.
+
+``ax.hist(num_df[col])``, ``ax.boxplot(...)`` and a one-marker-per-row
+scatter hand matplotlib the raw columns, so drawing time and memory grow
+with the number of specimens.  The classes here reduce chunks of data to
+fixed-size aggregates that are updated in a vectorized pass per chunk and
+merge across chunks or workers:
+
+* ``Histogram``: counts over fixed bin edges
+* ``Histogram2D``: a 2-D count grid, optionally with the per-cell sum of a
+  third variable so the mean can be used as colour
+* ``box_summary``: the five-number summary ``Axes.bxp`` needs, read from a
+  quantile sketch
+
+The ``draw_*`` helpers plot those aggregates; their cost only depends on
+the number of bins.
+"""
+
+import numpy as np
+
+
+def fixed_edges(lo, hi, bins):
+    """``bins + 1`` evenly spaced edges covering ``[lo, hi]``."""
+    if not np.isfinite(lo) or not np.isfinite(hi):
+        lo, hi = 0.0, 1.0
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(lo, hi, bins + 1)
+
+
+def _bin_index(values, edges):
+    """Bin of every value (last bin closed, like ``np.histogram``), -1 outside."""
+    idx = np.searchsorted(edges, values, side='right') - 1
+    idx[values == edges[-1]] = len(edges) - 2
+    idx[(values < edges[0]) | (values > edges[-1]) | np.isnan(values)] = -1
+    return idx
+
+
+class Histogram:
+    """Counts of values over fixed ``edges``; NaNs and out-of-range are tallied."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.outside = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        idx = _bin_index(values, self.edges)
+        inside = idx >= 0
+        self.counts += np.bincount(idx[inside], minlength=len(self.counts))
+        self.outside += int((~inside).sum())
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('cannot merge histograms with different edges')
+        self.counts += other.counts
+        self.outside += other.outside
+        return self
+
+
+class Histogram2D:
+    """Count grid over ``x_edges`` x ``y_edges`` with optional weight sums."""
+
+    def __init__(self, x_edges, y_edges):
+        self.x_edges = np.asarray(x_edges, dtype=np.float64)
+        self.y_edges = np.asarray(y_edges, dtype=np.float64)
+        shape = (len(self.x_edges) - 1, len(self.y_edges) - 1)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.sums = np.zeros(shape)
+
+    def update(self, x, y, weights=None):
+        xi = _bin_index(np.asarray(x, dtype=np.float64), self.x_edges)
+        yi = _bin_index(np.asarray(y, dtype=np.float64), self.y_edges)
+        inside = (xi >= 0) & (yi >= 0)
+        flat = xi[inside] * self.counts.shape[1] + yi[inside]
+        size = self.counts.size
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+        if weights is not None:
+            w = np.asarray(weights, dtype=np.float64)[inside]
+            self.sums += np.bincount(flat, weights=np.nan_to_num(w),
+                                     minlength=size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other):
+        if not (np.array_equal(self.x_edges, other.x_edges)
+                and np.array_equal(self.y_edges, other.y_edges)):
+            raise ValueError('cannot merge histograms with different edges')
+        self.counts += other.counts
+        self.sums += other.sums
+        return self
+
+    def means(self):
+        """Mean weight per cell, NaN where the cell is empty."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 0, self.sums / self.counts, np.nan)
+
+
+def box_summary(sketch, whis=1.5):
+    """Box-plot statistics of a ``KLLSketch``, as accepted by ``Axes.bxp``.
+
+    Whiskers stop at the most extreme value within ``whis`` x IQR of the
+    box (approximated by the fence clipped to the data range); the data
+    extremes beyond the fences are kept as the only fliers.
+    """
+    q1, med, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    lo_fence, hi_fence = q1 - whis * iqr, q3 + whis * iqr
+    fliers = [v for v in (sketch.min, sketch.max)
+              if v < lo_fence or v > hi_fence]
+    return {
+        'med': med, 'q1': q1, 'q3': q3,
+        'whislo': max(sketch.min, lo_fence),
+        'whishi': min(sketch.max, hi_fence),
+        'fliers': np.array(fliers, dtype=np.float64),
+    }
+
+
+def draw_histogram(ax, counts, edges, **style):
+    """Bar chart of pre-binned counts, styled like ``ax.hist``."""
+    edges = np.asarray(edges)
+    return ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                  **style)
+
+
+def draw_box(ax, stats, **kwargs):
+    """Box plot of a ``box_summary`` (or a list of them)."""
+    if isinstance(stats, dict):
+        stats = [stats]
+    return ax.bxp(stats, **kwargs)
+
+
+def draw_density(ax, grid, x_edges, y_edges, **kwargs):
+    """Colour mesh of a 2-D grid (counts or per-cell means)."""
+    grid = np.ma.masked_invalid(np.asarray(grid, dtype=np.float64))
+    return ax.pcolormesh(x_edges, y_edges, grid.T, **kwargs)
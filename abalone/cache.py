@@ -0,0 +1,194 @@
+"""On-disk columnar cache of the cleaned abalone dataset.
+
+Each cleaned dataset is written once as one raw binary file per column plus
+a ``meta.json`` describing dtypes, row count and the cleaning statistics.
+Later runs memory-map those files instead of re-parsing and re-cleaning
+the CSV.  Entries live under ``<cache_dir>/<key>/`` where the key hashes
+the source file contents together with the cleaning parameters, so editing
+either one simply produces a new entry.
+
+The cached frame is ``marine_df`` (negative values left as NaN, ``Sex`` as
+a category); ``num_df`` is rebuilt from it with the stored medians.  With
+``compact=True`` the columns keep the ``abalone.schema`` types on disk:
+float32 measurements and ``Rings`` as int16 values plus a missing-value
+mask.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from . import schema, stream
+from .columns import NUMERIC_COLS, SEX_COL
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = '.abalone_cache'
+SEX_CATEGORIES = ['F', 'I', 'M']
+
+
+@dataclass
+class CachedDataset:
+    """Memory-mapped cleaned dataset returned by ``load``."""
+
+    marine_df: pd.DataFrame
+    stats: stream.CleaningStats
+    path: str
+
+    @property
+    def num_df(self):
+        numeric = self.marine_df[[c for c in NUMERIC_COLS
+                                  if c in self.marine_df]]
+        return numeric.fillna(schema.fill_values(numeric, self.stats.medians))
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of the file contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(path, **params):
+    """Key of the cache entry for ``path`` cleaned with ``params``."""
+    payload = json.dumps(
+        {'version': CACHE_VERSION, 'source': file_digest(path),
+         'params': params},
+        sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _column_file(name):
+    # 'Whole weight (g)' -> 'whole_weight_g.bin'
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_') + '.bin'
+
+
+def _storage_dtypes(compact, derive_age):
+    """On-disk dtype per numeric column."""
+    numeric = [c for c in NUMERIC_COLS if c in schema.columns(derive_age)]
+    if not compact:
+        return {c: 'float64' for c in numeric}
+    return {c: 'int16' if c == 'Rings' else np.dtype(schema.FLOAT_DTYPE).name
+            for c in numeric}
+
+
+def build(path, entry_dir, chunksize=stream.DEFAULT_CHUNKSIZE, **params):
+    """Clean ``path`` chunk by chunk and write it to ``entry_dir``."""
+    compact = params.get('compact', False)
+    derive_age = params.get('derive_age', False)
+    stats = stream.scan_stats(
+        path, chunksize,
+        sketch_k=params.get('sketch_k', stream.DEFAULT_SKETCH_K),
+        seed=params.get('seed', 0), compact=compact, derive_age=derive_age)
+
+    parent = os.path.dirname(os.path.abspath(entry_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    storage = _storage_dtypes(compact, derive_age)
+    columns = {SEX_COL: ('int8', _column_file(SEX_COL))}
+    columns.update({c: (d, _column_file(c)) for c, d in storage.items()})
+    # Integer columns cannot hold NaN; their missing values go to a mask
+    masked = {c: _column_file(c)[:-len('.bin')] + '.mask'
+              for c, d in storage.items() if d.startswith('int')}
+    handles = {c: open(os.path.join(tmp_dir, f), 'wb')
+               for c, (_, f) in columns.items()}
+    handles.update({(c, 'mask'): open(os.path.join(tmp_dir, f), 'wb')
+                    for c, f in masked.items()})
+    n_rows = 0
+    try:
+        for chunk in stream.stream_clean(
+                path, chunksize, stats=stats, repair=False,
+                drop_duplicates=params.get('drop_duplicates', False),
+                compact=compact, derive_age=derive_age):
+            codes = pd.Categorical(chunk[SEX_COL],
+                                   categories=SEX_CATEGORIES).codes
+            handles[SEX_COL].write(codes.astype(np.int8).tobytes())
+            for c, dtype in storage.items():
+                if c in masked:
+                    missing = chunk[c].isna().to_numpy()
+                    values = chunk[c].to_numpy(dtype=dtype, na_value=0)
+                    handles[c, 'mask'].write(missing.tobytes())
+                else:
+                    values = chunk[c].to_numpy(dtype=dtype, na_value=np.nan)
+                handles[c].write(values.tobytes())
+            n_rows += len(chunk)
+    except BaseException:
+        for h in handles.values():
+            h.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    for h in handles.values():
+        h.close()
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(path),
+        'rows': n_rows,
+        'columns': {c: {'dtype': d, 'file': f} for c, (d, f) in columns.items()},
+        'masks': masked,
+        'categories': {SEX_COL: SEX_CATEGORIES},
+        'stats': stats.to_dict(),
+        'params': params,
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Another process finished the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return entry_dir
+
+
+def open_entry(entry_dir):
+    """Memory-map a cache entry written by ``build``."""
+    with open(os.path.join(entry_dir, 'meta.json')) as f:
+        meta = json.load(f)
+
+    def column(file_name, dtype):
+        if not meta['rows']:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(entry_dir, file_name), dtype=dtype,
+                         mode='r', shape=(meta['rows'],))
+
+    masks = meta.get('masks', {})
+    data = {}
+    for col, info in meta['columns'].items():
+        values = column(info['file'], info['dtype'])
+        if col in masks:
+            values = pd.arrays.IntegerArray(values, column(masks[col], bool))
+        elif col in meta['categories']:
+            values = pd.Categorical.from_codes(
+                values, categories=meta['categories'][col])
+        data[col] = values
+
+    marine_df = pd.DataFrame(data, columns=list(meta['columns']), copy=False)
+    return CachedDataset(
+        marine_df=marine_df,
+        stats=stream.CleaningStats.from_dict(meta['stats']),
+        path=entry_dir,
+    )
+
+
+def load(path, cache_dir=DEFAULT_CACHE_DIR, chunksize=stream.DEFAULT_CHUNKSIZE,
+         sketch_k=stream.DEFAULT_SKETCH_K, seed=0, drop_duplicates=False,
+         compact=False, derive_age=False):
+    """Return the cleaned dataset for ``path``, building the cache on a miss."""
+    params = {'sketch_k': sketch_k, 'seed': seed,
+              'drop_duplicates': drop_duplicates}
+    if compact or derive_age:
+        # Only added when set so existing entries keep their keys
+        params.update(compact=compact, derive_age=derive_age)
+    entry_dir = os.path.join(cache_dir, cache_key(path, **params))
+    if not os.path.exists(os.path.join(entry_dir, 'meta.json')):
+        build(path, entry_dir, chunksize, **params)
+    return open_entry(entry_dir)
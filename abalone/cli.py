@@ -0,0 +1,240 @@
+"""Command line interface: ``python -m abalone <command>``.
+
+``abalone_asm.py`` only runs inside Jupyter (it calls ``display()``) and
+imports pandas and matplotlib up front.  Each subcommand here imports what
+it needs when it runs, so building the parser costs only ``argparse`` and
+statistics runs never load matplotlib:
+
+===========  ==========================================================
+command      does
+===========  ==========================================================
+clean        stream the notebook cleaning into a new CSV
+stats        ``describe()``-style table, overall and per ``Sex``
+outliers     per-``Sex`` outlier flag counts (``abalone.outliers``)
+plot         render figures to PNG files (matplotlib)
+report       HTML/PDF report of every figure (matplotlib)
+===========  ==========================================================
+
+``--timings`` prints, on stderr, the CPU time the interpreter spent
+starting up before the CLI ran, the time of each lazy import and of the
+command itself.
+
+    python -m abalone stats abalone_growth.csv --by-sex --timings
+    python -m abalone outliers abalone_growth.csv -o flags.csv
+    python -m abalone report abalone_growth.csv -o report/
+"""
+
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Interpreter start-up and imports up to this point, in CPU seconds
+_STARTUP_CPU = time.process_time()
+_LOADED = time.perf_counter()
+
+
+class Timings:
+    """Wall-clock durations of labelled steps of one run."""
+
+    def __init__(self):
+        self.entries = [('startup (cpu)', _STARTUP_CPU)]
+
+    @contextmanager
+    def measure(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.entries.append((label, time.perf_counter() - start))
+
+    def load(self, name):
+        """Import ``name`` (relative to this package), timing first imports."""
+        module = importlib.util.resolve_name(name, __package__)
+        if module in sys.modules:
+            return sys.modules[module]
+        with self.measure(f'import {module}'):
+            return importlib.import_module(module)
+
+    def report(self, file=sys.stderr):
+        entries = self.entries + [('total', time.perf_counter() - _LOADED)]
+        width = max(len(label) for label, _ in entries)
+        for label, seconds in entries:
+            print(f'{label:<{width}}  {seconds * 1e3:10.1f} ms', file=file)
+
+
+def cmd_clean(args, timings):
+    stream = timings.load('.stream')
+    stream.write_clean(args.csv, args.output, args.chunksize,
+                       drop_duplicates=args.drop_duplicates,
+                       compact=args.compact)
+    print(args.output)
+    return 0
+
+
+def _chunks(args, timings):
+    stream = timings.load('.stream')
+    if args.raw:
+        return stream.read_chunks(args.csv, args.chunksize)
+    return stream.stream_clean(args.csv, args.chunksize)
+
+
+def cmd_stats(args, timings):
+    sketch = timings.load('.sketch')
+    columns = timings.load('.columns')
+    sketches = sketch.SketchSet(columns.NUMERIC_COLS,
+                                by=columns.SEX_COL if args.by_sex else None)
+    for chunk in _chunks(args, timings):
+        sketches.update(chunk)
+    with timings.load('pandas').option_context('display.width', 200):
+        print(sketches.describe().to_string(float_format=lambda v: f'{v:.4f}'))
+        for group in sketches.groups():
+            print(f'\n{columns.SEX_COL} = {group}')
+            print(sketches.describe(group).to_string(
+                float_format=lambda v: f'{v:.4f}'))
+    return 0
+
+
+def cmd_outliers(args, timings):
+    stream = timings.load('.stream')
+    outliers = timings.load('.outliers')
+    stats = stream.scan_stats(args.csv, args.chunksize)
+
+    def chunks():
+        return stream.stream_clean(args.csv, args.chunksize, stats=stats)
+
+    detector = outliers.OutlierDetector(iqr_k=args.iqr_k, mad_k=args.mad_k)
+    with timings.measure('fit'):
+        detector.fit(chunks)
+    counts, rows, flagged = None, 0, 0
+    header = True
+    for chunk in chunks():
+        flags = detector.score(chunk)
+        summary = detector.summary(flags)
+        counts = summary if counts is None else counts + summary
+        rows += len(flags)
+        flagged += int((flags > 0).sum())
+        if args.output:
+            frame = timings.load('pandas').DataFrame(
+                {'row': chunk.index, 'flags': flags})
+            frame.to_csv(args.output, mode='w' if header else 'a',
+                         header=header, index=False)
+            header = False
+    print(counts[counts > 0].to_string())
+    print(f'\n{flagged} of {rows} rows carry at least one flag')
+    return 0
+
+
+def cmd_plot(args, timings):
+    report = timings.load('.report')
+    stream = timings.load('.stream')
+    names = args.figure or list(report.FIGURES)
+    unknown = sorted(set(names) - set(report.FIGURES))
+    if unknown:
+        raise SystemExit(f'unknown figure(s) {unknown}; choose from '
+                         f'{list(report.FIGURES)}')
+    stats = stream.scan_stats(args.csv, args.chunksize)
+    with timings.measure('aggregate'):
+        inputs = report.aggregate(
+            lambda: stream.stream_clean(args.csv, args.chunksize, stats=stats))
+    with timings.measure('render'):
+        images = report.render_figures(
+            {n: inputs[n] for n in names},
+            args.cache_dir or report.DEFAULT_CACHE_DIR, args.workers)
+    os.makedirs(args.output, exist_ok=True)
+    for name, png in images.items():
+        path = os.path.join(args.output, f'{name}.png')
+        with open(path, 'wb') as f:
+            f.write(png)
+        print(path)
+    return 0
+
+
+def cmd_report(args, timings):
+    report = timings.load('.report')
+    stream = timings.load('.stream')
+    stats = stream.scan_stats(args.csv, args.chunksize)
+    with timings.measure('aggregate'):
+        inputs = report.aggregate(
+            lambda: stream.stream_clean(args.csv, args.chunksize, stats=stats))
+    with timings.measure('render'):
+        written = report.render_report(inputs, args.output, args.title,
+                                       args.format or ('html', 'pdf'),
+                                       args.cache_dir or report.DEFAULT_CACHE_DIR,
+                                       args.workers)
+    for path in written:
+        print(path)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone',
+        description='Clean, summarise and plot abalone survey files.')
+    parser.add_argument('--timings', action='store_true',
+                        help='print import and run times on stderr')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def command(name, func, help):
+        p = sub.add_parser(name, help=help)
+        p.add_argument('csv')
+        # Same default as stream.DEFAULT_CHUNKSIZE, without importing it
+        p.add_argument('--chunksize', type=int, default=100_000)
+        # Also accepted after the command; SUPPRESS keeps the global value
+        p.add_argument('--timings', action='store_true',
+                       default=argparse.SUPPRESS)
+        p.set_defaults(func=func)
+        return p
+
+    p = command('clean', cmd_clean, 'write the cleaned CSV')
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('--drop-duplicates', action='store_true')
+    p.add_argument('--compact', action='store_true',
+                   help='parse with the compact abalone.schema types')
+
+    p = command('stats', cmd_stats, 'summary statistics')
+    p.add_argument('--by-sex', action='store_true')
+    p.add_argument('--raw', action='store_true',
+                   help='summarise the file as is, without cleaning')
+
+    p = command('outliers', cmd_outliers, 'count outlier flags')
+    p.add_argument('-o', '--output', help='write row,flags CSV here')
+    p.add_argument('--iqr-k', type=float, default=1.5)
+    p.add_argument('--mad-k', type=float, default=3.5)
+
+    for name, func, help in [('plot', cmd_plot, 'render figures to PNG'),
+                             ('report', cmd_report, 'render the HTML/PDF report')]:
+        p = command(name, func, help)
+        p.add_argument('-o', '--output', default='figures' if name == 'plot'
+                       else 'report')
+        p.add_argument('--cache-dir', help='figure cache (default '
+                       '.abalone_cache/figures)')
+        p.add_argument('--workers', type=int)
+    sub.choices['plot'].add_argument(
+        '--figure', action='append', help='figure name (repeatable)')
+    sub.choices['report'].add_argument('--title', default='Abalone report')
+    sub.choices['report'].add_argument(
+        '--format', action='append', choices=['html', 'pdf'],
+        help='output format (repeatable, default both)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    timings = Timings()
+    # Every command needs the data stack; timed apart from the abalone modules
+    for name in ('numpy', 'pandas'):
+        timings.load(name)
+    try:
+        with timings.measure(f'run {args.command}'):
+            return args.func(args, timings)
+    finally:
+        if args.timings:
+            timings.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
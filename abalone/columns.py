@@ -0,0 +1,27 @@
+"""Column names and cleaning rules taken from the abalone_asm notebook."""
+
+SEX_COL = 'Sex'
+
+# Every numerical attribute of a specimen, in file order
+NUMERIC_COLS = [
+    'Length (mm)', 'Diameter (mm)',
+    'Height (mm)', 'Whole weight (g)',
+    'Shucked weight (g)', 'Viscera weight (g)',
+    'Shell weight (g)', 'Rings', 'Age (y)']
+
+ALL_COLS = [SEX_COL] + NUMERIC_COLS
+
+# Rows missing any of these are dropped (less than 1% missing each)
+DROPNA_COLS = ['Length (mm)', 'Diameter (mm)', 'Height (mm)']
+
+# The rest of the missing values are filled with the column mean
+MEAN_FILL_COLS = [
+    'Height (mm)', 'Whole weight (g)',
+    'Shucked weight (g)', 'Viscera weight (g)',
+    'Shell weight (g)', 'Rings', 'Age (y)']
+
+# Negative measurements are nonsensical and replaced by the column median
+MEDIAN_FILL_COLS = NUMERIC_COLS
+
+# age = rings + 1.5
+AGE_OFFSET = 1.5
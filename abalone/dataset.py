@@ -0,0 +1,317 @@
+"""Many abalone CSV files read as one dataset.
+
+Surveys arrive as one file per site per day in the ``abalone_growth.csv``
+layout, usually stored in hive-style directories::
+
+    surveys/site=north/date=2024-05-01/part-0.csv
+    surveys/site=north/date=2024-05-02/part-0.csv
+    surveys/site=south/date=2024-05-01/part-0.csv
+
+``PartitionedDataset`` takes a directory, a glob pattern or a list of files,
+turns every ``key=value`` path segment into a partition column and parses
+the files in parallel on a process pool.  Two things are pushed down into
+the parse:
+
+* column projection: only the requested columns (plus those needed by a
+  filter) are parsed, through ``read_csv(usecols=...)``
+* filters: ``(column, op, value)`` triples.  Filters on partition columns
+  prune whole files before anything is read; filters on data columns are
+  applied in the worker so rejected rows never leave it.
+
+Files that do not use ``key=value`` directories can name their levels with
+``partitioning=['site', 'date']``; the last level is then the file name
+without its extension.
+
+    ds = PartitionedDataset('surveys/', columns=['Sex', 'Rings'],
+                            filters=[('Sex', '==', 'I'),
+                                     ('date', '>=', '2024-05-01')])
+    frame = ds.to_frame()
+    for chunk in ds.clean():
+        ...
+"""
+
+import copy
+import datetime
+import glob
+import operator
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from . import schema, stream
+from .columns import ALL_COLS
+
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+    'in': lambda a, b: a in b, 'not in': lambda a, b: a not in b,
+}
+
+
+@dataclass(frozen=True)
+class Fragment:
+    """One file of the dataset and its partition values."""
+
+    path: str
+    partition: dict = field(default_factory=dict)
+
+
+def _has_magic(path):
+    return any(c in path for c in '*?[')
+
+
+def discover(source, pattern='*.csv'):
+    """Sorted list of files under a directory, matching a glob or listed."""
+    if isinstance(source, (list, tuple)):
+        return sorted(os.fspath(p) for p in source)
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '**', pattern),
+                                recursive=True))
+    if _has_magic(source):
+        return sorted(glob.glob(source, recursive=True))
+    return [source]
+
+
+def parse_partition(path, root=None, partitioning='hive'):
+    """Partition values of ``path`` relative to ``root``."""
+    relative = os.path.relpath(path, root) if root else path
+    parts = os.path.normpath(relative).split(os.sep)
+    if partitioning == 'hive':
+        return dict(p.split('=', 1) for p in parts[:-1] if '=' in p)
+    if partitioning is None:
+        return {}
+    levels = parts[:-1] + [os.path.splitext(parts[-1])[0]]
+    return dict(zip(partitioning, levels[-len(partitioning):]))
+
+
+def _coerce(raw, like):
+    """Convert a partition string to the type of the filter value."""
+    if isinstance(like, (list, tuple, set, frozenset)):
+        like = next(iter(like), raw)
+    try:
+        if isinstance(like, datetime.datetime):
+            return datetime.datetime.fromisoformat(raw)
+        if isinstance(like, datetime.date):
+            return datetime.date.fromisoformat(raw)
+        if isinstance(like, (int, float, np.number)) and not isinstance(like, bool):
+            return type(like)(raw)
+    except ValueError:
+        return raw
+    return raw
+
+
+def _check(filters):
+    for column, op, _ in filters:
+        if op not in OPERATORS:
+            raise ValueError(f'unknown filter operator {op!r} on {column!r}')
+
+
+def filter_mask(frame, filters):
+    """Boolean row mask of ``frame`` matching every ``(column, op, value)``."""
+    mask = np.ones(len(frame), dtype=bool)
+    for column, op, value in filters:
+        if op in ('in', 'not in'):
+            hit = frame[column].isin(value) ^ (op == 'not in')
+        else:
+            hit = OPERATORS[op](frame[column], value)
+        # Comparisons with missing values count as no match
+        mask &= hit.to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+def _read_fragment(path, partition, usecols, dtype, filters, keep):
+    """Worker: parse one file, filter its rows and add partition columns."""
+    frame = pd.read_csv(path, usecols=lambda c: c in usecols, dtype=dtype)
+    if filters:
+        frame = frame[filter_mask(frame, filters)]
+    frame = frame[[c for c in keep if c in frame]]
+    for key, value in partition.items():
+        frame.insert(len(frame.columns), key, value)
+    return frame.reset_index(drop=True)
+
+
+def _apply_fragment(task, func, args):
+    return func(_read_fragment(*task), *args)
+
+
+def _ordered_map(func, tasks, max_workers=None):
+    """Yield ``func(*task)`` per task in order, run on a process pool.
+
+    At most two tasks per worker are submitted ahead of the consumer, so
+    results (parsed frames) pile up only when the consumer falls behind by
+    that many, however many files the dataset has.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for task in tasks:
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(func, *task))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # The consumer stopped early: do not parse the rest
+            for future in pending:
+                future.cancel()
+
+
+class PartitionedDataset:
+    """A directory, glob or list of same-layout CSV files read as one.
+
+    ``columns`` defaults to every column of the file layout; every
+    partition column is appended unless ``columns`` names some of them.
+    ``compact`` parses with the ``abalone.schema`` types.  ``max_workers=1``
+    parses in-process.
+    """
+
+    def __init__(self, source, columns=None, filters=(), partitioning='hive',
+                 compact=False, max_workers=None, pattern='*.csv'):
+        self.source = source
+        self.columns = list(columns) if columns is not None else list(ALL_COLS)
+        self.filters = list(filters)
+        self.partitioning = partitioning
+        self.compact = compact
+        self.max_workers = max_workers
+        self.pattern = pattern
+        _check(self.filters)
+
+        root = None
+        if not isinstance(source, (list, tuple)):
+            root = os.fspath(source)
+            if _has_magic(root):
+                root = _glob_root(root)
+            elif not os.path.isdir(root):
+                root = os.path.dirname(root)
+        self.all_fragments = [
+            Fragment(p, parse_partition(p, root, partitioning))
+            for p in discover(source, pattern)]
+        self.partition_keys = sorted(
+            {k for f in self.all_fragments for k in f.partition})
+
+    def _derive(self, **changes):
+        derived = copy.copy(self)
+        derived.__dict__.update(changes)
+        _check(derived.filters)
+        return derived
+
+    def select(self, columns):
+        """Dataset reading only ``columns``."""
+        return self._derive(columns=list(columns))
+
+    def filter(self, *filters):
+        """Dataset with ``filters`` added to the existing ones."""
+        return self._derive(filters=self.filters + list(filters))
+
+    def _split_filters(self):
+        partition = [f for f in self.filters if f[0] in self.partition_keys]
+        rows = [f for f in self.filters if f[0] not in self.partition_keys]
+        return partition, rows
+
+    @property
+    def fragments(self):
+        """Fragments left after partition pruning."""
+        partition_filters, _ = self._split_filters()
+        kept = []
+        for fragment in self.all_fragments:
+            values = fragment.partition
+            if all(key in values
+                   and OPERATORS[op](_coerce(values[key], value), value)
+                   for key, op, value in partition_filters):
+                kept.append(fragment)
+        return kept
+
+    def _tasks(self):
+        _, row_filters = self._split_filters()
+        data_columns = [c for c in self.columns if c not in self.partition_keys]
+        usecols = set(data_columns) | {f[0] for f in row_filters}
+        dtype = None
+        if self.compact:
+            dtype = {c: t for c, t in schema.dtypes().items() if c in usecols}
+        partition_columns = [c for c in self.columns if c in self.partition_keys]
+        for fragment in self.fragments:
+            partition = {k: fragment.partition.get(k)
+                         for k in (partition_columns or self.partition_keys)}
+            yield (fragment.path, partition, usecols, dtype, row_filters,
+                   data_columns)
+
+    def iter_fragments(self):
+        """Yield one parsed and filtered frame per fragment, in path order."""
+        tasks = list(self._tasks())
+        if self.max_workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield _read_fragment(*task)
+            return
+        yield from _ordered_map(_read_fragment, tasks, self.max_workers)
+
+    def map_fragments(self, func, *args):
+        """Yield ``func(frame, *args)`` per fragment, run in the workers.
+
+        Only the results travel back to this process, so ``func`` can
+        reduce each file (to partial aggregates, say) where it is parsed.
+        ``func`` must be picklable, e.g. a module-level function.
+        """
+        tasks = list(self._tasks())
+        if self.max_workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield _apply_fragment(task, func, args)
+            return
+        yield from _ordered_map(_apply_fragment,
+                                [(task, func, args) for task in tasks],
+                                self.max_workers)
+
+    def iter_chunks(self, chunksize=stream.DEFAULT_CHUNKSIZE):
+        """Yield frames of about ``chunksize`` rows across fragments."""
+        pending, size = [], 0
+        for frame in self.iter_fragments():
+            pending.append(frame)
+            size += len(frame)
+            if size >= chunksize:
+                yield pd.concat(pending, ignore_index=True)
+                pending, size = [], 0
+        if pending:
+            yield pd.concat(pending, ignore_index=True)
+
+    def to_frame(self):
+        """All selected rows as one frame; partition columns as categories."""
+        frames = list(self.iter_fragments())
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        frame = pd.concat(frames, ignore_index=True)
+        for key in self.partition_keys:
+            if key in frame:
+                frame[key] = frame[key].astype('category')
+        return frame
+
+    def scan_stats(self, sketch_k=stream.DEFAULT_SKETCH_K, seed=0):
+        """``stream.scan_stats`` over the selected rows."""
+        return stream.stats_from_chunks(self.iter_fragments(), sketch_k, seed)
+
+    def clean(self, stats=None, repair=True, chunksize=stream.DEFAULT_CHUNKSIZE):
+        """Yield cleaned chunks; statistics come from a first pass if needed."""
+        if stats is None:
+            stats = self.scan_stats()
+        for chunk in self.iter_chunks(chunksize):
+            yield stream.clean_chunk(chunk, stats, repair=repair)
+
+    def __repr__(self):
+        return (f'PartitionedDataset({self.source!r}, '
+                f'{len(self.fragments)}/{len(self.all_fragments)} files, '
+                f'columns={self.columns!r}, filters={self.filters!r})')
+
+
+def _glob_root(pattern):
+    """Directory part of ``pattern`` before its first wildcard."""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep):
+        if _has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or None
@@ -0,0 +1,281 @@
+"""Exact and near-duplicate specimen detection.
+
+``marine_df.duplicated()`` only catches bit-identical rows.  Re-measured
+specimens differ by rounding in the third or fourth decimal, and comparing
+every pair of rows is quadratic.  ``DedupIndex`` keeps two indexes that
+grow with each ingest batch:
+
+* exact: a 64-bit hash of every row (all columns, ``Sex`` included).  A row
+  is an exact duplicate when an earlier row has the same hash; a false
+  match needs a hash collision, about n ** 2 / 2 ** 65 for n rows.
+* near: a grid over a few key columns with cells twice as wide as the
+  tolerance.  Two rows within tolerance on a column are in the same cell or
+  in adjacent cells, and then the other row is on the side of the cell the
+  first row is closer to.  Every row is stored under its own cell and
+  probes its own cell plus the nearer neighbour in each key column
+  (2 ** len(key_columns) cells), so no pair within tolerance is missed.
+  A missing key value gets a cell of its own (``_NAN_CELL``), so rows
+  missing the same key columns still meet; a value matches a missing one
+  on no column.
+  Candidates are then verified on every compared column: measurements
+  within their tolerance, ``Rings`` and ``Sex`` equal.
+
+Both indexes are sorted key arrays merged like a binary counter, so adding
+a batch of m rows to n stored rows costs O(m log^2 n) plus the number of
+candidates, never the number of pairs.
+
+A row is flagged when it duplicates any earlier row; ``match`` is the
+earliest such row.
+
+    index = DedupIndex(tolerance=0.001)
+    for chunk in chunks:
+        result = index.add(chunk)
+        kept = chunk[~result.duplicated]
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .columns import SEX_COL
+from .schema import MEASUREMENT_COLS
+
+DEFAULT_TOLERANCE = 0.001
+KEY_COLS = ['Length (mm)', 'Diameter (mm)', 'Height (mm)',
+            'Whole weight (g)']
+EXACT_COLS = ['Rings']
+SEX_CATEGORIES = ['F', 'I', 'M']
+
+# Relative slack so that differences equal to the tolerance survive rounding
+_SLACK = 1e-9
+# Grid coordinate of a missing key value, far from any real cell
+_NAN_CELL = float(np.iinfo(np.int64).min)
+
+
+def _splitmix(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _cell_key(sex_codes, cells):
+    """Hash the Sex code and integer cell coordinates into one uint64."""
+    with np.errstate(over='ignore'):
+        h = _splitmix(sex_codes.astype(np.uint64))
+        for column in cells.T:
+            h = _splitmix(h ^ column.astype(np.int64).view(np.uint64))
+    return h
+
+
+class _SortedRuns:
+    """Multimap from uint64 keys to row ids, as sorted runs.
+
+    Runs are merged whenever the newest is at least as long as the one
+    before it, so there are O(log n) runs of geometrically growing size.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.runs)
+
+    @property
+    def nbytes(self):
+        return sum(keys.nbytes + ids.nbytes for keys, ids in self.runs)
+
+    def add(self, keys, ids):
+        while self.runs and len(self.runs[-1][0]) <= len(keys):
+            old_keys, old_ids = self.runs.pop()
+            keys = np.concatenate([old_keys, keys])
+            ids = np.concatenate([old_ids, ids])
+        order = np.lexsort((ids, keys))
+        self.runs.append((keys[order], ids[order]))
+
+    def lookup(self, probes):
+        """(probe position, id) for every stored key equal to a probe."""
+        # Sorted probes walk each run in order, which keeps the binary
+        # searches in cache; several times faster than random probes
+        order = np.argsort(probes)
+        probes = probes[order]
+        positions, found = [], []
+        for keys, ids in self.runs:
+            lo = np.searchsorted(keys, probes, 'left')
+            n = np.searchsorted(keys, probes, 'right') - lo
+            total = int(n.sum())
+            if not total:
+                continue
+            starts = np.repeat(lo - (np.cumsum(n) - n), n)
+            positions.append(np.repeat(order, n))
+            found.append(ids[starts + np.arange(total)])
+        if not positions:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        return np.concatenate(positions), np.concatenate(found)
+
+
+class _RowStore:
+    """Compared values of every row added so far, addressed by row id."""
+
+    def __init__(self):
+        self.starts = []
+        self.blocks = []
+
+    def append(self, start, block):
+        self.starts.append(start)
+        self.blocks.append(block)
+
+    def take(self, ids):
+        which = np.searchsorted(self.starts, ids, 'right') - 1
+        out = None
+        for b in np.unique(which):
+            rows = which == b
+            block = self.blocks[b][ids[rows] - self.starts[b]]
+            if out is None:
+                out = np.empty((len(ids),) + block.shape[1:], block.dtype)
+            out[rows] = block
+        return out
+
+    @property
+    def nbytes(self):
+        return sum(b.nbytes for b in self.blocks)
+
+
+@dataclass
+class BatchResult:
+    """Duplicate flags for one batch passed to ``DedupIndex.add``."""
+
+    start: int
+    exact: np.ndarray
+    near: np.ndarray
+    match: np.ndarray
+
+    @property
+    def duplicated(self):
+        return self.exact | self.near
+
+    def to_frame(self, index=None):
+        """One row per flagged row: global row id, kind and matching row."""
+        flagged = np.flatnonzero(self.duplicated)
+        kind = np.where(self.exact[flagged], 'exact', 'near')
+        return pd.DataFrame({
+            'row': self.start + flagged,
+            'kind': kind,
+            'match': self.match[flagged],
+        }, index=None if index is None else index[flagged])
+
+
+class DedupIndex:
+    """Incremental exact and near-duplicate index.
+
+    ``tolerance`` is an absolute tolerance for every measurement column or
+    a dict per column; ``near=False`` keeps only the exact index.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, near=True,
+                 key_columns=KEY_COLS):
+        if not isinstance(tolerance, dict):
+            tolerance = {c: tolerance for c in MEASUREMENT_COLS}
+        self.tolerance = {**{c: 0.0 for c in EXACT_COLS}, **tolerance}
+        self.columns = list(self.tolerance)
+        self.key_columns = list(key_columns)
+        if near and any(self.tolerance.get(c, 0) <= 0 for c in self.key_columns):
+            raise ValueError('key columns need a positive tolerance')
+        self.near = near
+        self.rows = 0
+        self._exact = _SortedRuns()
+        self._grid = _SortedRuns()
+        self._store = _RowStore()
+        self._tol = np.array([self.tolerance[c] for c in self.columns])
+        self._key_idx = [self.columns.index(c) for c in self.key_columns]
+
+    @property
+    def nbytes(self):
+        return self._exact.nbytes + self._grid.nbytes + self._store.nbytes
+
+    def add(self, batch):
+        """Index ``batch`` and flag its rows that repeat an earlier row."""
+        n = len(batch)
+        start = self.rows
+        ids = np.arange(start, start + n)
+        self.rows += n
+
+        hashes = pd.util.hash_pandas_object(batch, index=False).to_numpy()
+        self._exact.add(hashes, ids)
+        positions, found = self._exact.lookup(hashes)
+        match = _earliest(n, positions, found, found < ids[positions])
+        exact = match >= 0
+        if not self.near:
+            return BatchResult(start, exact, np.zeros(n, bool), match)
+
+        values = batch[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        sex = pd.Categorical(batch[SEX_COL], categories=SEX_CATEGORIES).codes
+        self._store.append(start, np.column_stack([values, sex]))
+
+        near_match = self._near_matches(values, sex, ids)
+        near = ~exact & (near_match >= 0)
+        match[near] = near_match[near]
+        return BatchResult(start, exact, near, match)
+
+    def _near_matches(self, values, sex, ids):
+        width = 2 * self._tol[self._key_idx]
+        scaled = values[:, self._key_idx] / width
+        cells = np.floor(scaled)
+        side = np.where(scaled - cells < 0.5, -1, 1)
+        # Missing values only probe their own sentinel cell
+        missing = np.isnan(scaled)
+        cells[missing] = _NAN_CELL
+        side[missing] = 0
+        self._grid.add(_cell_key(sex, cells), ids)
+
+        # Own cell plus the nearer neighbour in every subset of key columns
+        k = len(self._key_idx)
+        offsets = (np.arange(2 ** k)[:, None] >> np.arange(k)) & 1
+        probes = cells[None] + offsets[:, None, :] * side[None]
+        probe_keys = _cell_key(np.tile(sex, 2 ** k), probes.reshape(-1, k))
+        positions, found = self._grid.lookup(probe_keys)
+        positions = positions % len(sex)
+
+        earlier = found < ids[positions]
+        positions, found = positions[earlier], found[earlier]
+        if not len(found):
+            return np.full(len(values), -1, dtype=np.int64)
+        other = self._store.take(found)
+        mine = np.column_stack([values, sex])[positions]
+        diff = np.abs(mine[:, :-1] - other[:, :-1])
+        both_missing = np.isnan(mine[:, :-1]) & np.isnan(other[:, :-1])
+        close = (diff <= self._tol * (1 + _SLACK)) | both_missing
+        ok = close.all(axis=1) & (mine[:, -1] == other[:, -1])
+        return _earliest(len(values), positions, found, ok)
+
+
+def _earliest(n, positions, found, valid):
+    """Smallest valid ``found`` id per position, -1 where there is none."""
+    match = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(match, positions[valid], found[valid])
+    match[match == np.iinfo(np.int64).max] = -1
+    return match
+
+
+def find_duplicates(frame, tolerance=DEFAULT_TOLERANCE, near=True):
+    """Report of the duplicated rows of ``frame``, indexed like ``frame``."""
+    return DedupIndex(tolerance, near).add(frame).to_frame(frame.index)
+
+
+def drop_duplicates(frame, tolerance=DEFAULT_TOLERANCE, near=True):
+    """``frame`` without the rows that repeat an earlier row."""
+    return frame[~DedupIndex(tolerance, near).add(frame).duplicated]
+
+
+def dedup_chunks(chunks, tolerance=DEFAULT_TOLERANCE, near=True, report=None):
+    """Yield ``chunks`` with duplicates removed across all of them.
+
+    Flagged rows are appended to the ``report`` list as frames when given.
+    """
+    index = DedupIndex(tolerance, near)
+    for chunk in chunks:
+        result = index.add(chunk)
+        if report is not None:
+            report.append(result.to_frame(chunk.index))
+        yield chunk[~result.duplicated]
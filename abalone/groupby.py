@@ -0,0 +1,259 @@
+"""Out-of-core group-by aggregation of the numeric columns.
+
+The extension task builds ``marine_df.groupby('Sex').mean()`` and
+``groupby('Sex')[['Age (y)', 'Whole weight (g)']].agg(['count', 'mean'])``
+on the full table.  ``GroupAggregator`` gets the same tables from a stream
+of chunks.  For every group (``Sex`` plus any extra keys such as ``site``
+or ``date``) and numeric column it keeps
+
+* count, sum, sum of squares, min and max, updated per chunk with
+  ``np.bincount`` and ``np.minimum.reduceat`` after one sort by group
+* a KLL quantile sketch (``abalone.sketch``) for medians and quartiles
+
+Only the selected numeric columns are aggregated, so the string ``Sex``
+column never reaches ``mean()``.  Aggregators built on different chunks,
+files or processes ``merge`` into one; ``aggregate_dataset`` runs the
+per-file part in the ``PartitionedDataset`` workers.
+
+    agg = aggregate_chunks(stream.stream_clean('abalone_growth.csv'))
+    agg.table(['count', 'mean'], ['Age (y)', 'Whole weight (g)'])
+    agg.relative_table()          # the notebook's gender_group
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import stream
+from .columns import NUMERIC_COLS, SEX_COL
+from .sketch import DEFAULT_K, KLLSketch
+
+STATS = ['count', 'sum', 'mean', 'std', 'var', 'min', 'max',
+         'median', '25%', '75%']
+_QUANTILES = {'median': 0.5, '25%': 0.25, '75%': 0.75}
+
+
+class _Partial:
+    """Aggregates of one group across all numeric columns."""
+
+    __slots__ = ('count', 'total', 'squares', 'lo', 'hi', 'sketches')
+
+    def __init__(self, d, sketches):
+        self.count = np.zeros(d, dtype=np.int64)
+        self.total = np.zeros(d)
+        self.squares = np.zeros(d)
+        self.lo = np.full(d, np.inf)
+        self.hi = np.full(d, -np.inf)
+        self.sketches = sketches
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        np.minimum(self.lo, other.lo, out=self.lo)
+        np.maximum(self.hi, other.hi, out=self.hi)
+        if self.sketches is not None and other.sketches is not None:
+            for mine, theirs in zip(self.sketches, other.sketches):
+                mine.merge(theirs)
+
+
+def _factorize(frame, keys, dropna=True):
+    """Group id per row and the key tuple of each group id.
+
+    With ``dropna`` rows missing any key get id -1, as ``groupby`` drops
+    them; otherwise a missing key is a group of its own.
+    """
+    codes, levels = [], []
+    missing = np.zeros(len(frame), dtype=bool)
+    for key in keys:
+        c, u = pd.factorize(frame[key], use_na_sentinel=dropna)
+        missing |= c < 0
+        codes.append(np.where(c < 0, 0, c))
+        levels.append(np.asarray(u, dtype=object))
+    shape = [max(len(u), 1) for u in levels]
+    combined = np.ravel_multi_index(codes, shape) if codes else np.zeros(len(frame), np.intp)
+    uniques, inverse = np.unique(combined[~missing], return_inverse=True)
+    group_ids = np.full(len(frame), -1, dtype=np.intp)
+    group_ids[~missing] = inverse.ravel()
+    labels = [tuple(level[i] for level, i in zip(levels, index))
+              for index in zip(*np.unravel_index(uniques, shape))] if keys else [()]
+    return group_ids, labels
+
+
+class GroupAggregator:
+    """Mergeable per-group partial aggregates of numeric columns.
+
+    ``keys`` defaults to ``Sex``; ``quantiles=False`` skips the sketches
+    (and the median/quartile statistics) for lower cost per chunk.  As in
+    pandas, rows with a missing key are left out unless ``dropna=False``.
+    """
+
+    def __init__(self, keys=(SEX_COL,), columns=NUMERIC_COLS, quantiles=True,
+                 k=DEFAULT_K, seed=0, dropna=True):
+        self.keys = list(keys)
+        self.dropna = dropna
+        self.columns = list(columns)
+        self.quantiles = quantiles
+        self.k = k
+        self._seed = np.random.SeedSequence(seed)
+        self.partials = {}
+        self.rows = 0
+
+    def _partial(self, label):
+        if label not in self.partials:
+            sketches = None
+            if self.quantiles:
+                seeds = self._seed.spawn(len(self.columns))
+                sketches = [KLLSketch(self.k, seed=s) for s in seeds]
+            self.partials[label] = _Partial(len(self.columns), sketches)
+        return self.partials[label]
+
+    def update(self, frame):
+        """Fold one chunk into the aggregates; NaNs are skipped per column."""
+        group_ids, labels = _factorize(frame, self.keys, self.dropna)
+        keep = group_ids >= 0
+        if not keep.all():
+            frame, group_ids = frame[keep], group_ids[keep]
+        if not len(frame):
+            return self
+        order = np.argsort(group_ids, kind='stable')
+        group_ids = group_ids[order]
+        values = frame[self.columns].to_numpy(
+            dtype=np.float64, na_value=np.nan)[order]
+        valid = ~np.isnan(values)
+        zeroed = np.where(valid, values, 0.0)
+        starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+        n_groups = len(labels)
+
+        count = np.stack([np.bincount(group_ids, valid[:, j], n_groups)
+                          for j in range(len(self.columns))], axis=1)
+        total = np.stack([np.bincount(group_ids, zeroed[:, j], n_groups)
+                          for j in range(len(self.columns))], axis=1)
+        squares = np.stack([np.bincount(group_ids, zeroed[:, j] ** 2, n_groups)
+                            for j in range(len(self.columns))], axis=1)
+        lo = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+        hi = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+
+        bounds = np.r_[starts, len(values)]
+        for g, label in enumerate(labels):
+            partial = self._partial(label)
+            partial.count += count[g].astype(np.int64)
+            partial.total += total[g]
+            partial.squares += squares[g]
+            np.minimum(partial.lo, lo[g], out=partial.lo)
+            np.maximum(partial.hi, hi[g], out=partial.hi)
+            if partial.sketches is not None:
+                block = values[bounds[g]:bounds[g + 1]]
+                for j, sketch in enumerate(partial.sketches):
+                    column = block[:, j]
+                    sketch.update(column[~np.isnan(column)])
+        self.rows += len(frame)
+        return self
+
+    def merge(self, other):
+        """Fold another aggregator with the same keys and columns into this."""
+        if (other.keys != self.keys or other.columns != self.columns
+                or other.dropna != self.dropna):
+            raise ValueError('cannot merge aggregators over different keys, '
+                             'columns or dropna')
+        for label, partial in other.partials.items():
+            self._partial(label).merge(partial)
+        self.rows += other.rows
+        return self
+
+    def groups(self):
+        return sorted(self.partials, key=lambda label: tuple(map(str, label)))
+
+    def _stat(self, partial, stat):
+        n = partial.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if stat == 'count':
+                return n
+            if stat == 'sum':
+                return partial.total
+            if stat == 'mean':
+                return np.where(n > 0, partial.total / n, np.nan)
+            if stat in ('var', 'std'):
+                var = (partial.squares - partial.total ** 2 / n) / (n - 1)
+                var = np.where(n > 1, np.maximum(var, 0.0), np.nan)
+                return var if stat == 'var' else np.sqrt(var)
+            if stat == 'min':
+                return np.where(n > 0, partial.lo, np.nan)
+            if stat == 'max':
+                return np.where(n > 0, partial.hi, np.nan)
+        if stat in _QUANTILES:
+            if partial.sketches is None:
+                raise ValueError(f'{stat!r} needs quantiles=True')
+            return np.array([s.quantile(_QUANTILES[stat]) if s.n else np.nan
+                             for s in partial.sketches])
+        raise ValueError(f'unknown statistic {stat!r}; choose from {STATS}')
+
+    def _index(self, labels):
+        if len(self.keys) == 1:
+            return pd.Index([label[0] for label in labels], name=self.keys[0])
+        return pd.MultiIndex.from_tuples(labels, names=self.keys)
+
+    def table(self, stats=('count', 'mean'), columns=None):
+        """Like ``groupby(keys)[columns].agg(stats)``, one row per group."""
+        columns = list(columns or self.columns)
+        positions = [self.columns.index(c) for c in columns]
+        labels = self.groups()
+        data = {}
+        for column, j in zip(columns, positions):
+            for stat in stats:
+                data[column, stat] = [self._stat(self.partials[label], stat)[j]
+                                      for label in labels]
+        return pd.DataFrame(data, index=self._index(labels))
+
+    def mean(self, columns=None):
+        """Like ``groupby(keys).mean()`` over the numeric columns."""
+        table = self.table(['mean'], columns)
+        table.columns = table.columns.droplevel(1)
+        return table
+
+    def relative_table(self, columns=('Age (y)', 'Whole weight (g)'),
+                       within=None):
+        """Count/mean table with the notebook's ``Relative percentage``.
+
+        The percentage is each group's share of the ``columns[0]`` count,
+        overall or, with ``within`` (a subset of the keys), inside each
+        combination of those keys.
+        """
+        table = self.table(['count', 'mean'], columns).reset_index()
+        counts = table[columns[0], 'count']
+        if within:
+            totals = counts.groupby(
+                [table[k, ''] if (k, '') in table else table[k]
+                 for k in within]).transform('sum')
+        else:
+            totals = counts.sum()
+        table['Relative percentage'] = counts / totals * 100
+        return table
+
+
+def aggregate_chunks(chunks, keys=(SEX_COL,), columns=NUMERIC_COLS, **kwargs):
+    """One ``GroupAggregator`` over every chunk of an iterable."""
+    aggregator = GroupAggregator(keys, columns, **kwargs)
+    for chunk in chunks:
+        aggregator.update(chunk)
+    return aggregator
+
+
+def _aggregate_fragment(frame, keys, columns, kwargs, stats):
+    if stats is not None:
+        frame = stream.clean_chunk(frame, stats)
+    return GroupAggregator(keys, columns, **kwargs).update(frame)
+
+
+def aggregate_dataset(dataset, keys=(SEX_COL,), columns=NUMERIC_COLS,
+                      stats=None, **kwargs):
+    """Aggregate a ``PartitionedDataset`` file by file in its workers.
+
+    Each worker parses, optionally cleans with ``stats`` (see
+    ``dataset.scan_stats``) and aggregates one file; only the partial
+    aggregates come back to be merged.
+    """
+    aggregator = GroupAggregator(keys, columns, **kwargs)
+    for partial in dataset.map_fragments(_aggregate_fragment, list(keys),
+                                         list(columns), kwargs, stats):
+        aggregator.merge(partial)
+    return aggregator
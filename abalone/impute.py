@@ -0,0 +1,331 @@
+"""Model-based imputation of missing and negative measurements.
+
+The notebook fills missing Height, weights and Rings with global means and
+negative values with global medians, although the dimensions and weights of
+a specimen predict each other closely.  The imputers here fill every
+missing (or negative) value from the columns observed on the same
+specimen, separately per ``Sex``:
+
+* ``RegressionImputer`` keeps the mean vector and cross-product matrix of
+  the complete rows per group.  For each pattern of observed columns it
+  solves once for the linear regression of the missing columns on the
+  observed ones (the conditional mean of a Gaussian), so it fits in one
+  streaming pass and imputes at matrix-product speed.
+* ``KNNImputer`` keeps a uniform sample of at most ``max_reference``
+  complete rows per group and averages the ``k`` nearest of them, measured
+  on the observed columns after scaling each column by its standard
+  deviation.  Lookups go through one ``scipy.spatial.cKDTree`` per group
+  and pattern, so imputing n rows costs O(n log n).
+
+Rows are grouped by missing pattern and imputed a batch at a time.
+Imputed ring counts are rounded and ``Age (y)`` is rebuilt as
+``Rings + 1.5`` where it was missing.
+
+    imputer = RegressionImputer().fit_chunks(chunks)
+    for chunk in impute_chunks(chunks, imputer):
+        ...
+
+or, for a file with the notebook's dropna step first,
+
+    for chunk in impute_file('abalone_growth.csv', method='knn'):
+        ...
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import stream
+from .columns import AGE_OFFSET, DROPNA_COLS, SEX_COL
+from .schema import MEASUREMENT_COLS
+
+IMPUTE_COLS = MEASUREMENT_COLS + ['Rings']
+AGE_COL = 'Age (y)'
+SEX_CATEGORIES = ['F', 'I', 'M']
+
+# Group used for rows whose Sex is missing or unknown
+POOLED = 'all'
+
+# Missing patterns with fewer rows are matched by a linear scan, no tree
+BRUTE_FORCE_ROWS = 64
+
+
+def _sex_groups(frame, by):
+    if by is None or by not in frame:
+        return np.full(len(frame), POOLED, dtype=object)
+    sex = frame[by].astype(object).to_numpy()
+    known = pd.Series(sex).isin(SEX_CATEGORIES).to_numpy()
+    return np.where(known, sex, POOLED)
+
+
+def _prepare(frame, columns):
+    """Float block of ``columns`` with negative values turned into NaN.
+
+    Also returns the mask of cells that need replacing in ``frame``.
+    """
+    block = frame[columns].to_numpy(dtype=np.float64, na_value=np.nan,
+                                    copy=True)
+    with np.errstate(invalid='ignore'):
+        block[block < 0] = np.nan
+    replace = np.isnan(block)
+    if 'Rings' in columns and AGE_COL in frame:
+        # Age is Rings + 1.5, so a recorded age still gives the ring count
+        rings = block[:, columns.index('Rings')]
+        age = frame[AGE_COL].to_numpy(dtype=np.float64, na_value=np.nan)
+        recover = np.isnan(rings) & (age >= AGE_OFFSET)
+        rings[recover] = age[recover] - AGE_OFFSET
+    return block, replace
+
+
+class _Imputer:
+    """Shared grouping and write-back; subclasses implement ``_fill``."""
+
+    def __init__(self, by=SEX_COL, columns=IMPUTE_COLS):
+        self.by = by
+        self.columns = list(columns)
+
+    def fit(self, frame):
+        self._reset()
+        return self.partial_fit(frame)
+
+    def fit_chunks(self, chunks):
+        self._reset()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def partial_fit(self, frame):
+        block, _ = _prepare(frame, self.columns)
+        complete = ~np.isnan(block).any(axis=1)
+        groups = _sex_groups(frame, self.by)
+        self._add(POOLED, block[complete])
+        for group in SEX_CATEGORIES:
+            self._add(group, block[complete & (groups == group)])
+        return self
+
+    def transform(self, frame):
+        """Copy of ``frame`` with missing and negative values imputed."""
+        block, replace = _prepare(frame, self.columns)
+        missing = np.isnan(block)
+        todo = missing.any(axis=1)
+        groups = _sex_groups(frame, self.by)
+        filled = block.copy()
+
+        patterns = np.packbits(missing, axis=1, bitorder='little')
+        patterns = patterns.view(f'V{patterns.shape[1]}').ravel()
+        for group in np.unique(groups[todo]):
+            in_group = todo & (groups == group)
+            group = group if self._fitted(group) else POOLED
+            for pattern in np.unique(patterns[in_group]):
+                rows = np.flatnonzero(in_group & (patterns == pattern))
+                gaps = missing[rows[0]]
+                if gaps.all():
+                    filled[np.ix_(rows, gaps)] = self._center(group)
+                else:
+                    filled[np.ix_(rows, gaps)] = self._fill(
+                        group, ~gaps, block[np.ix_(rows, ~gaps)])
+        # Linear fits can extrapolate below zero for the smallest specimens
+        np.maximum(filled, 0, out=filled, where=missing)
+        return self._write(frame, filled, replace)
+
+    def _write(self, frame, filled, replace):
+        frame = frame.copy()
+        if 'Rings' in self.columns:
+            i = self.columns.index('Rings')
+            filled[:, i] = np.round(filled[:, i])
+        for i, column in enumerate(self.columns):
+            rows = replace[:, i]
+            if rows.any():
+                dtype = frame[column].dtype
+                values = filled[rows, i]
+                if pd.api.types.is_integer_dtype(dtype):
+                    values = values.astype(np.int64)
+                elif isinstance(dtype, np.dtype):
+                    values = values.astype(dtype)
+                frame.loc[rows, column] = values
+        if AGE_COL in frame and 'Rings' in self.columns:
+            age = frame[AGE_COL].to_numpy(dtype=np.float64, na_value=np.nan)
+            with np.errstate(invalid='ignore'):
+                rebuild = ~(age >= 0)
+            frame.loc[rebuild, AGE_COL] = (
+                filled[rebuild, self.columns.index('Rings')] + AGE_OFFSET)
+        return frame
+
+
+class RegressionImputer(_Imputer):
+    """Per-group conditional-mean (linear regression) imputation.
+
+    ``ridge`` is added to the diagonal of the observed covariance, relative
+    to its trace, to keep nearly collinear weights solvable.
+    """
+
+    def __init__(self, by=SEX_COL, columns=IMPUTE_COLS, ridge=1e-6):
+        super().__init__(by, columns)
+        self.ridge = ridge
+        self._reset()
+
+    def _reset(self):
+        self.n = {}
+        self.sums = {}
+        self.cross = {}
+        self._solved = {}
+
+    def _add(self, group, rows):
+        if not len(rows):
+            return
+        d = len(self.columns)
+        self.n[group] = self.n.get(group, 0) + len(rows)
+        self.sums[group] = self.sums.get(group, np.zeros(d)) + rows.sum(axis=0)
+        self.cross[group] = self.cross.get(group, np.zeros((d, d))) + rows.T @ rows
+        self._solved.clear()
+
+    def _fitted(self, group):
+        return self.n.get(group, 0) > len(self.columns)
+
+    def _center(self, group):
+        return self.sums[group] / self.n[group]
+
+    def covariance(self, group=POOLED):
+        mean = self._center(group)
+        return self.cross[group] / self.n[group] - np.outer(mean, mean)
+
+    def _fill(self, group, observed, values):
+        key = (group, observed.tobytes())
+        if key not in self._solved:
+            mean, cov = self._center(group), self.covariance(group)
+            cov_oo = cov[np.ix_(observed, observed)]
+            cov_oo = cov_oo + np.eye(len(cov_oo)) * (
+                self.ridge * np.trace(cov_oo) / len(cov_oo))
+            coef = np.linalg.solve(cov_oo, cov[np.ix_(observed, ~observed)])
+            self._solved[key] = (coef, mean[~observed] - mean[observed] @ coef)
+        coef, intercept = self._solved[key]
+        return values @ coef + intercept
+
+
+class KNNImputer(_Imputer):
+    """Per-group k-nearest-neighbour imputation over a KD-tree.
+
+    ``weights`` is ``'uniform'`` or ``'distance'`` (inverse distance).
+    ``workers`` is passed to ``cKDTree.query``; -1 uses every core.
+    """
+
+    def __init__(self, k=5, by=SEX_COL, columns=IMPUTE_COLS,
+                 max_reference=200_000, weights='uniform', workers=1, seed=0):
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError as exc:
+            raise ImportError(
+                'KNNImputer needs scipy; install it or use '
+                'RegressionImputer') from exc
+        if weights not in ('uniform', 'distance'):
+            raise ValueError(f'unknown weights: {weights!r}')
+        super().__init__(by, columns)
+        self._tree_class = cKDTree
+        self.k = k
+        self.max_reference = max_reference
+        self.weights = weights
+        self.workers = workers
+        self.rng = np.random.default_rng(seed)
+        self._reset()
+
+    def _reset(self):
+        self.reference = {}
+        self.priority = {}
+        self._trees = {}
+        self._scale = None
+
+    def _add(self, group, rows):
+        # Bottom-k sampling: keep the rows with the smallest random
+        # priorities, a uniform sample however the batches are split
+        if not len(rows):
+            return
+        priority = self.rng.random(len(rows))
+        if group in self.reference:
+            rows = np.concatenate([self.reference[group], rows])
+            priority = np.concatenate([self.priority[group], priority])
+        if len(rows) > self.max_reference:
+            keep = np.argpartition(priority, self.max_reference)[:self.max_reference]
+            rows, priority = rows[keep], priority[keep]
+        self.reference[group] = rows
+        self.priority[group] = priority
+        self._trees.clear()
+        self._scale = None
+
+    def _fitted(self, group):
+        return len(self.reference.get(group, ())) > 0
+
+    def _center(self, group):
+        return np.median(self.reference[group], axis=0)
+
+    def _fill(self, group, observed, values):
+        if self._scale is None:
+            scale = self.reference[POOLED].std(axis=0)
+            self._scale = np.where(scale > 0, scale, 1.0)
+        reference = self.reference[group]
+        k = min(self.k, len(reference))
+        query = values / self._scale[observed]
+        if len(values) < BRUTE_FORCE_ROWS:
+            # Building a tree costs more than scanning for a handful of rows
+            distance, index = self._scan(reference[:, observed]
+                                         / self._scale[observed], query, k)
+        else:
+            key = (group, observed.tobytes())
+            if key not in self._trees:
+                self._trees[key] = self._tree_class(
+                    reference[:, observed] / self._scale[observed])
+            distance, index = self._trees[key].query(
+                query, k=k, workers=self.workers)
+            distance = distance.reshape(len(values), k)
+            index = index.reshape(len(values), k)
+        neighbours = reference[index][..., ~observed]
+        if self.weights == 'uniform':
+            return neighbours.mean(axis=1)
+        weight = 1 / np.maximum(distance, 1e-12)
+        return (neighbours * weight[..., None]).sum(axis=1) / weight.sum(axis=1)[:, None]
+
+    @staticmethod
+    def _scan(points, query, k, block=16):
+        # |p - q|^2 = |p|^2 - 2 p.q + |q|^2, with the product done by BLAS
+        norms = (points ** 2).sum(axis=1)
+        distance = np.empty((len(query), k))
+        index = np.empty((len(query), k), dtype=np.int64)
+        for start in range(0, len(query), block):
+            rows = slice(start, start + block)
+            d2 = norms - 2 * (query[rows] @ points.T)
+            nearest = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            index[rows] = nearest
+            d2 = np.take_along_axis(d2, nearest, axis=1)
+            distance[rows] = np.sqrt(np.maximum(
+                d2 + (query[rows] ** 2).sum(axis=1)[:, None], 0))
+        return distance, index
+
+
+METHODS = {'regression': RegressionImputer, 'knn': KNNImputer}
+
+
+def make_imputer(method='regression', **kwargs):
+    try:
+        return METHODS[method](**kwargs)
+    except KeyError:
+        raise ValueError(f'unknown imputation method: {method!r}') from None
+
+
+def impute_chunks(chunks, imputer):
+    """Yield every chunk imputed with a fitted ``imputer``."""
+    for chunk in chunks:
+        yield imputer.transform(chunk)
+
+
+def impute_file(path, method='regression', chunksize=stream.DEFAULT_CHUNKSIZE,
+                imputer=None, **kwargs):
+    """Drop rows missing dimensions, fit an imputer, yield imputed chunks.
+
+    This replaces steps 2 and 3 of ``abalone.stream`` with model-based
+    fills; ``kwargs`` go to the imputer.  Two passes over the file.
+    """
+    def chunks():
+        for chunk in stream.read_chunks(path, chunksize):
+            yield chunk.dropna(subset=DROPNA_COLS)
+
+    if imputer is None:
+        imputer = make_imputer(method, **kwargs).fit_chunks(chunks())
+    yield from impute_chunks(chunks(), imputer)
@@ -0,0 +1,515 @@
+"""Lazy query plans over abalone files, datasets and frames.
+
+Several notebook cells copy far more than they show: ``num_df`` copies all
+nine numeric columns, ``sort_values`` sorts every column to print three,
+``marine_df[marine_df['Sex'] == 'M']['Age (y)']`` scans the whole frame
+once per ``Sex`` and ``outlier_age`` copies full rows.  Here ``scan``,
+``filter``, ``select``, ``clean``, ``sort`` and ``agg`` only build a plan;
+nothing is read until ``collect`` (or ``collect_all``) is called.
+
+Before running, ``optimize`` rewrites the plan:
+
+* predicate push-down: filters move into the scan, where a
+  ``PartitionedDataset`` prunes files and filters in its workers.  A
+  filter only moves below ``clean`` when it is on a column cleaning does
+  not change (``Sex``, partition columns); the cleaning statistics are
+  still computed on the rows ``clean`` saw in the original plan.
+* projection push-down: only the columns used by the result, the filters
+  and the dropna step of cleaning are parsed.
+* ``sort`` with a ``limit`` keeps the top rows of each chunk instead of
+  sorting everything; ``agg`` skips the quantile sketches unless a median
+  or quartile is requested.
+
+``collect_all`` runs several plans that differ only in an equality filter
+on the same column (``Sex == 'M'``, ``Sex == 'F'``, ...) as one pass that
+splits every chunk by that column; ``partition_by`` is the shorthand.
+
+    clean = lazy.scan('abalone_growth.csv').clean()
+    clean.filter(('Sex', '==', 'M')).select(['Age (y)']).collect()
+    clean.select(['Sex', 'Age (y)']).partition_by('Sex')
+    clean.select(['Sex', 'Rings', 'Age (y)']).sort('Age (y)', limit=10)
+    clean.agg(['count', 'mean'], ['Age (y)', 'Whole weight (g)'])
+    print(clean.filter(('Age (y)', '>', 17.5)).select(['Age (y)']).explain())
+"""
+
+import dataclasses
+import os
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from . import groupby, stream
+from .columns import DROPNA_COLS, NUMERIC_COLS, SEX_COL
+from .dataset import PartitionedDataset, _check, filter_mask
+
+SEX_VALUES = ('F', 'I', 'M')
+_QUANTILE_STATS = {'median', '25%', '75%'}
+
+
+def _freeze(filters):
+    frozen = []
+    for column, op, value in filters:
+        if isinstance(value, (list, set, frozenset)):
+            value = tuple(value)
+        frozen.append((column, op, value))
+    _check(frozen)
+    return tuple(frozen)
+
+
+@dataclass(frozen=True)
+class Scan:
+    """Read ``source`` in chunks; ``columns=None`` reads every column."""
+
+    source: object = field(compare=False, repr=False)
+    key: object
+    columns: tuple = None
+    filters: tuple = ()
+    compact: bool = False
+    chunksize: int = stream.DEFAULT_CHUNKSIZE
+
+
+@dataclass(frozen=True)
+class Filter:
+    child: object
+    predicates: tuple
+
+
+@dataclass(frozen=True)
+class Project:
+    child: object
+    columns: tuple
+
+
+@dataclass(frozen=True)
+class Clean:
+    """Notebook cleaning; ``stats=None`` computes them from the input."""
+
+    child: object
+    repair: bool = True
+    stats: object = field(default=None, compare=False, repr=False)
+
+
+@dataclass(frozen=True)
+class Sort:
+    child: object
+    by: tuple
+    ascending: bool = True
+    limit: int = None
+
+
+@dataclass(frozen=True)
+class GroupAgg:
+    child: object
+    keys: tuple
+    columns: tuple
+    stats: tuple
+
+
+TERMINALS = (Sort, GroupAgg)
+
+
+@dataclass
+class Plan:
+    """An optimized plan: one scan, row-wise operators, a terminal."""
+
+    scan: Scan
+    ops: list
+    terminal: object = None
+    # id(Clean op) -> Plan producing the rows its statistics come from
+    stats_plans: dict = field(default_factory=dict)
+
+    def explain(self):
+        scan = self.scan
+        lines = [f'Scan {scan.key}  columns={_names(scan.columns)}'
+                 f'{"  filters=" + _predicates(scan.filters) if scan.filters else ""}']
+        for op in self.ops:
+            if isinstance(op, Filter):
+                lines.append(f'  Filter {_predicates(op.predicates)}')
+            elif isinstance(op, Project):
+                lines.append(f'  Project {_names(op.columns)}')
+            else:
+                source = 'given' if op.stats is not None else 'first pass'
+                lines.append(f'  Clean repair={op.repair} stats={source}')
+        terminal = self.terminal
+        if isinstance(terminal, Sort):
+            lines.append(f'  Sort by={_names(terminal.by)} '
+                         f'ascending={terminal.ascending} limit={terminal.limit}')
+        elif isinstance(terminal, GroupAgg):
+            lines.append(f'  GroupAgg keys={_names(terminal.keys)} '
+                         f'columns={_names(terminal.columns)} '
+                         f'stats={list(terminal.stats)}')
+        else:
+            lines.append('  Collect')
+        return '\n'.join(lines)
+
+
+def _names(columns):
+    return 'all' if columns is None else '[' + ', '.join(columns) + ']'
+
+
+def _predicates(predicates):
+    return ' & '.join(f'{c} {op} {v!r}' for c, op, v in predicates)
+
+
+def _chain(node):
+    """Nodes of a linear plan, scan first."""
+    nodes = []
+    while not isinstance(node, Scan):
+        nodes.append(node)
+        node = node.child
+    nodes.append(node)
+    return nodes[::-1]
+
+
+def _passes(op, column):
+    """Whether a filter on ``column`` can move below ``op``."""
+    return not isinstance(op, Clean) or column not in NUMERIC_COLS
+
+
+def _union(columns, extra):
+    if columns is None:
+        return None
+    return columns + [c for c in extra if c not in columns]
+
+
+def optimize(node):
+    """Push predicates and projections of ``node`` down into its scan."""
+    nodes = _chain(node)
+    scan, rest = nodes[0], nodes[1:]
+    terminal = rest.pop() if rest and isinstance(rest[-1], TERMINALS) else None
+    if any(isinstance(op, TERMINALS) for op in rest):
+        raise ValueError('sort() and agg() must be the last step of a plan')
+
+    pushed, ops, inputs = list(scan.filters), [], {}
+    for op in rest:
+        if isinstance(op, Filter):
+            kept = []
+            for predicate in op.predicates:
+                if all(_passes(o, predicate[0]) for o in ops):
+                    pushed.append(predicate)
+                else:
+                    kept.append(predicate)
+            if kept and ops and isinstance(ops[-1], Filter):
+                ops[-1] = Filter(None, ops[-1].predicates + tuple(kept))
+            elif kept:
+                ops.append(Filter(None, tuple(kept)))
+            continue
+        op = dataclasses.replace(op, child=None)
+        if isinstance(op, Clean) and op.stats is None:
+            # Statistics see the rows as written, before later filters
+            inputs[id(op)] = (tuple(pushed), list(ops))
+        ops.append(op)
+
+    need = None
+    if isinstance(terminal, GroupAgg):
+        need = list(terminal.keys) + list(terminal.columns)
+    return _project(scan, tuple(pushed), ops, terminal, need, inputs)
+
+
+def _project(scan, filters, ops, terminal, need, inputs):
+    """Plan reading only the columns ``need`` (None: all) depends on."""
+    ops, stats_plans = list(ops), {}
+    for i in range(len(ops) - 1, -1, -1):
+        op = ops[i]
+        if isinstance(op, Project):
+            columns = [c for c in op.columns if need is None or c in need]
+            ops[i] = Project(None, tuple(columns))
+            need = columns
+        elif isinstance(op, Filter):
+            need = _union(need, [p[0] for p in op.predicates])
+        else:
+            need = _union(need, DROPNA_COLS)
+            if id(op) in inputs:
+                below_filters, below = inputs[id(op)]
+                stats_plans[id(op)] = _project(scan, below_filters, below,
+                                               None, need, inputs)
+    columns = _union(need, [p[0] for p in filters])
+    scan = dataclasses.replace(
+        scan, filters=filters,
+        columns=None if columns is None else tuple(columns))
+    return Plan(scan, ops, terminal, stats_plans)
+
+
+def _signature(plan):
+    """Hashable identity of the rows ``plan`` produces."""
+    scan = plan.scan
+    parts = [scan.key, scan.columns, scan.filters, scan.compact, scan.chunksize]
+    for op in plan.ops:
+        if isinstance(op, Clean):
+            stats = (id(op.stats) if op.stats is not None
+                     else _signature(plan.stats_plans[id(op)]))
+            parts.append(('clean', op.repair, stats))
+        else:
+            parts.append(op)
+    return tuple(parts)
+
+
+def _read(scan):
+    """Chunks of the scan's source with its columns and filters applied."""
+    source, columns = scan.source, scan.columns
+    if isinstance(source, PartitionedDataset):
+        if columns is not None:
+            source = source.select(columns)
+        yield from source.filter(*scan.filters).iter_chunks(scan.chunksize)
+        return
+    if isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[start:start + scan.chunksize]
+                  for start in range(0, max(len(source), 1), scan.chunksize))
+    else:
+        kwargs = {} if columns is None else {'usecols': lambda c: c in columns}
+        chunks = stream.read_chunks(source, scan.chunksize, scan.compact,
+                                    **kwargs)
+    for chunk in chunks:
+        if columns is not None:
+            chunk = chunk[[c for c in chunk.columns if c in columns]]
+        if scan.filters:
+            chunk = chunk[filter_mask(chunk, scan.filters)]
+        yield chunk
+
+
+def _steps(plan, cache):
+    """Per-chunk functions for the row operators of ``plan``."""
+    steps = []
+    for op in plan.ops:
+        if isinstance(op, Filter):
+            steps.append(lambda c, p=op.predicates: c[filter_mask(c, p)])
+        elif isinstance(op, Project):
+            steps.append(lambda c, columns=list(op.columns): c[columns])
+        else:
+            stats = op.stats
+            if stats is None:
+                stats = _stats(plan.stats_plans[id(op)], cache)
+            steps.append(lambda c, s=stats, r=op.repair:
+                         stream.clean_chunk(c, s, repair=r))
+    return steps
+
+
+def _apply(steps, chunk):
+    for step in steps:
+        chunk = step(chunk)
+    return chunk
+
+
+def _stats(plan, cache):
+    """Cleaning statistics of the rows of ``plan``, computed once per run."""
+    key = _signature(plan)
+    if key not in cache:
+        steps = _steps(plan, cache)
+        cache[key] = stream.stats_from_chunks(
+            _apply(steps, chunk) for chunk in _read(plan.scan))
+    return cache[key]
+
+
+class _Rows:
+    def __init__(self):
+        self.chunks = []
+
+    def update(self, chunk):
+        self.chunks.append(chunk)
+
+    def result(self):
+        return pd.concat(self.chunks) if self.chunks else pd.DataFrame()
+
+
+class _TopRows:
+    """Sort; with a limit only the best ``limit`` rows of each chunk stay."""
+
+    def __init__(self, sort):
+        self.by, self.ascending, self.limit = list(sort.by), sort.ascending, sort.limit
+        self.chunks = []
+
+    def _sort(self, frame):
+        return frame.sort_values(self.by, ascending=self.ascending,
+                                 kind='stable')
+
+    def update(self, chunk):
+        if self.limit is None:
+            self.chunks.append(chunk)
+            return
+        top = None
+        if all(pd.api.types.is_numeric_dtype(chunk[c]) for c in self.by):
+            pick = chunk.nsmallest if self.ascending else chunk.nlargest
+            top = pick(self.limit, self.by)
+            if len(top) < min(self.limit, len(chunk)):
+                top = None          # NaNs were dropped; sort_values keeps them
+        if top is None:
+            top = self._sort(chunk).head(self.limit)
+        self.chunks = [self._sort(pd.concat(self.chunks + [top])).head(self.limit)]
+
+    def result(self):
+        if not self.chunks:
+            return pd.DataFrame()
+        frame = self._sort(pd.concat(self.chunks))
+        return frame if self.limit is None else frame.head(self.limit)
+
+
+class _Aggregate:
+    def __init__(self, agg):
+        self.agg = agg
+        self.aggregator = groupby.GroupAggregator(
+            agg.keys, agg.columns,
+            quantiles=bool(_QUANTILE_STATS & set(agg.stats)))
+
+    def update(self, chunk):
+        self.aggregator.update(chunk)
+
+    def result(self):
+        return self.aggregator.table(list(self.agg.stats))
+
+
+def _sink(terminal):
+    if isinstance(terminal, Sort):
+        return _TopRows(terminal)
+    if isinstance(terminal, GroupAgg):
+        return _Aggregate(terminal)
+    return _Rows()
+
+
+def _split_column(plans):
+    """A column every plan filters on with exactly one ``==``, or None."""
+    candidates = None
+    for plan in plans:
+        equal = [p[0] for p in plan.scan.filters if p[1] == '==']
+        single = {c for c in equal if equal.count(c) == 1}
+        candidates = single if candidates is None else candidates & single
+    if not candidates:
+        return None
+    return SEX_COL if SEX_COL in candidates else sorted(candidates)[0]
+
+
+def _fuse(plans):
+    """(scan, split column, members) per pass; members are
+    (plan index, split value, leftover scan filters)."""
+    groups = {}
+    for i, plan in enumerate(plans):
+        scan = plan.scan
+        groups.setdefault((scan.key, scan.compact, scan.chunksize), []).append(i)
+    for indices in groups.values():
+        column = _split_column([plans[i] for i in indices]) if len(indices) > 1 else None
+        if column is None:
+            for i in indices:
+                yield plans[i].scan, None, [(i, None, ())]
+            continue
+        values, rest = [], []
+        for i in indices:
+            filters = plans[i].scan.filters
+            values.append(next(v for c, op, v in filters
+                               if c == column and op == '=='))
+            rest.append([p for p in filters if not (p[0] == column and p[1] == '==')])
+        common = [p for p in rest[0] if all(p in r for r in rest[1:])]
+        columns = [plans[i].scan.columns for i in indices]
+        if any(c is None for c in columns):
+            merged = None
+        else:
+            merged = [column]
+            for c in columns:
+                merged = _union(merged, c)
+        scan = dataclasses.replace(
+            plans[indices[0]].scan,
+            columns=None if merged is None else tuple(merged),
+            filters=tuple(common) + ((column, 'in', tuple(dict.fromkeys(values))),))
+        members = [(i, value, tuple(p for p in r if p not in common))
+                   for i, value, r in zip(indices, values, rest)]
+        yield scan, column, members
+
+
+def collect_all(*frames):
+    """Results of several ``LazyFrame`` plans, sharing passes where possible.
+
+    Plans over the same source that differ only in an equality filter on
+    one column run as a single scan split by that column; cleaning
+    statistics shared by several plans are computed once.
+    """
+    plans = [optimize(f.node) for f in frames]
+    cache, results = {}, [None] * len(plans)
+    for scan, column, members in _fuse(plans):
+        routes = {}
+        pipelines = []
+        for i, value, leftover in members:
+            steps = _steps(plans[i], cache)
+            if leftover:
+                steps.insert(0, lambda c, p=leftover: c[filter_mask(c, p)])
+            pipeline = (i, steps, _sink(plans[i].terminal))
+            pipelines.append(pipeline)
+            routes.setdefault(value, []).append(pipeline)
+        for chunk in _read(scan):
+            if column is None:
+                pieces = [(None, chunk)]
+            else:
+                pieces = chunk.groupby(column, sort=False, observed=True)
+            for value, piece in pieces:
+                for _, steps, sink in routes.get(value, ()):
+                    sink.update(_apply(steps, piece))
+        for i, _, sink in pipelines:
+            results[i] = sink.result()
+    return results
+
+
+class LazyFrame:
+    """Deferred query over a file, ``PartitionedDataset`` or DataFrame."""
+
+    def __init__(self, node):
+        self.node = node
+
+    def filter(self, *filters):
+        """Keep rows matching every ``(column, op, value)`` triple."""
+        return LazyFrame(Filter(self.node, _freeze(filters)))
+
+    def select(self, columns):
+        return LazyFrame(Project(self.node, tuple(columns)))
+
+    def clean(self, stats=None, repair=True):
+        """The notebook cleaning (see ``stream.clean_chunk``)."""
+        return LazyFrame(Clean(self.node, repair, stats))
+
+    def sort(self, by, ascending=True, limit=None):
+        """Sorted rows; ``limit`` keeps only the first rows of the order."""
+        by = (by,) if isinstance(by, str) else tuple(by)
+        return LazyFrame(Sort(self.node, by, ascending, limit))
+
+    def agg(self, stats=('count', 'mean'), columns=None, keys=(SEX_COL,)):
+        """Per-group table as ``GroupAggregator.table`` builds it."""
+        if columns is None:
+            columns = [c for c in NUMERIC_COLS if c not in keys]
+        return LazyFrame(GroupAgg(self.node, tuple(keys), tuple(columns),
+                                  tuple(stats)))
+
+    def optimize(self):
+        return optimize(self.node)
+
+    def explain(self):
+        return self.optimize().explain()
+
+    def collect(self):
+        return collect_all(self)[0]
+
+    def partition_by(self, column=SEX_COL, values=None):
+        """``{value: result}`` of this plan per value of ``column``, in one pass."""
+        if values is None:
+            if column != SEX_COL:
+                raise ValueError(f'values are needed to partition by {column!r}')
+            values = SEX_VALUES
+        frames = []
+        for value in values:
+            node = self.node
+            predicate = ((column, '==', value),)
+            if isinstance(node, TERMINALS):
+                node = dataclasses.replace(node, child=Filter(node.child, predicate))
+            else:
+                node = Filter(node, predicate)
+            frames.append(LazyFrame(node))
+        return dict(zip(values, collect_all(*frames)))
+
+    def __repr__(self):
+        return f'LazyFrame\n{self.explain()}'
+
+
+def scan(source, compact=False, chunksize=stream.DEFAULT_CHUNKSIZE):
+    """Start a plan on a CSV path, a ``PartitionedDataset`` or a DataFrame."""
+    if isinstance(source, pd.DataFrame):
+        key = f'<frame {id(source):#x}>'
+    elif isinstance(source, PartitionedDataset):
+        key = f'<dataset {source.source} {id(source):#x}>'
+    else:
+        key = os.path.abspath(os.fspath(source))
+    return LazyFrame(Scan(source, key, compact=compact, chunksize=chunksize))
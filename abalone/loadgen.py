@@ -0,0 +1,117 @@
+"""Local load generator for ``abalone.service``.
+
+Opens ``--concurrency`` keep-alive connections, each posting one specimen
+at a time (rows sampled from a CSV in the ``abalone_growth.csv`` layout)
+until ``--requests`` have been sent in total, then prints client-side
+throughput and latency percentiles next to the server's ``/metrics``.
+
+    python -m abalone.service model.bin --port 8080 &
+    python -m abalone.loadgen --port 8080 --concurrency 64 --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .columns import SEX_COL
+from .model import FEATURE_COLS
+
+# The repository's dataset, wherever the command is run from
+SOURCE_CSV = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'abalone_growth.csv')
+
+
+def sample_bodies(path=SOURCE_CSV, n=1000, seed=0):
+    """``n`` encoded JSON request bodies drawn from the rows of ``path``."""
+    frame = pd.read_csv(path, usecols=FEATURE_COLS + [SEX_COL])
+    rows = frame.sample(n, replace=True, random_state=seed)
+    records = json.loads(rows.to_json(orient='records'))
+    return [json.dumps(r).encode() for r in records]
+
+
+async def _request(reader, writer, host, method, path, body=b''):
+    writer.write(
+        f'{method} {path} HTTP/1.1\r\nHost: {host}\r\n'
+        f'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _client(host, port, bodies, counter, total, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] < total:
+            i = counter[0]
+            counter[0] += 1
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, 'POST',
+                                       '/predict', bodies[i % len(bodies)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(host='127.0.0.1', port=8080, concurrency=32, requests=10_000,
+              csv=SOURCE_CSV, seed=0):
+    """Drive the service; returns client-side stats and the server metrics."""
+    bodies = sample_bodies(csv, min(requests, 10_000), seed)
+    latencies, errors, counter = [], [], [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, bodies, counter, requests, latencies, errors)
+        for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, server = await _request(reader, writer, host, 'GET', '/metrics')
+    writer.close()
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    client = {
+        'requests': len(latencies), 'errors': len(errors),
+        'elapsed_s': elapsed, 'throughput_rps': len(latencies) / elapsed,
+        'latency_p50_ms': float(p50), 'latency_p99_ms': float(p99),
+    }
+    return client, server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone.loadgen',
+        description='Send concurrent single-specimen requests to the service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--csv', default=SOURCE_CSV)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    client, server = asyncio.run(run(args.host, args.port, args.concurrency,
+                                     args.requests, args.csv, args.seed))
+    print('client  ' + '  '.join(f'{k}={v:.4g}' for k, v in client.items()))
+    print('server  ' + '  '.join(f'{k}={v:.4g}' for k, v in server.items()))
+    return 0 if not client['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Linear regression of abalone rings (and age) on physical measurements.
+
+The notebook stops at ``age = rings + 1.5``.  ``LinearAgeModel`` predicts
+``Rings`` from the shell dimensions, the four weights and one-hot ``Sex``
+(female is the baseline level), and age follows from the same formula.
+
+The model only keeps the sufficient statistics X^T X, X^T y, y^T y and the
+row count.  ``partial_fit`` adds a chunk to them, so refitting after a new
+survey batch costs O(features^2) per row of the batch plus one small solve,
+instead of re-reading the whole history.
+"""
+
+import json
+
+import numpy as np
+
+from . import stream
+from .columns import AGE_OFFSET, SEX_COL
+
+FEATURE_COLS = [
+    'Length (mm)', 'Diameter (mm)', 'Height (mm)',
+    'Whole weight (g)', 'Shucked weight (g)',
+    'Viscera weight (g)', 'Shell weight (g)']
+
+# One-hot levels of Sex; 'F' is the baseline absorbed by the intercept
+SEX_LEVELS = ['I', 'M']
+
+TARGET_COL = 'Rings'
+
+TERMS = ['intercept'] + FEATURE_COLS + [f'Sex={s}' for s in SEX_LEVELS]
+
+
+def design_matrix(frame):
+    """Design matrix (intercept, measurements, Sex dummies) of a frame."""
+    X = np.empty((len(frame), len(TERMS)))
+    X[:, 0] = 1.0
+    X[:, 1:1 + len(FEATURE_COLS)] = frame[FEATURE_COLS].to_numpy(np.float64)
+    sex = frame[SEX_COL].to_numpy()
+    for i, level in enumerate(SEX_LEVELS):
+        X[:, 1 + len(FEATURE_COLS) + i] = sex == level
+    return X
+
+
+class LinearAgeModel:
+    """Least-squares rings model fitted from accumulated sufficient statistics.
+
+    ``ridge`` adds an L2 penalty to every coefficient but the intercept,
+    which keeps the solve well-posed on small or collinear batches.
+    ``stats`` optionally records the cleaning statistics of the training
+    data so that new measurements can be cleaned the same way.
+    """
+
+    def __init__(self, ridge=0.0, stats=None):
+        self.ridge = ridge
+        self.stats = stats
+        k = len(TERMS)
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+        self.n = 0
+        self.coef_ = None
+
+    def partial_fit(self, X, y):
+        """Add a chunk to the sufficient statistics and refresh ``coef_``.
+
+        Rows with a missing feature or target are skipped.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ok = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        if not ok.all():
+            X, y = X[ok], y[ok]
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.yty += float(y @ y)
+        self.n += len(y)
+        self.coef_ = self._solve()
+        return self
+
+    def fit(self, X, y):
+        """Fit from scratch on one in-memory batch using a QR solve."""
+        self.__init__(self.ridge, self.stats)
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ok = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        X, y = X[ok], y[ok]
+        self.xtx = X.T @ X
+        self.xty = X.T @ y
+        self.yty = float(y @ y)
+        self.n = len(y)
+
+        if self.ridge:
+            # Augmenting with sqrt(ridge) * I is the QR form of ridge
+            penalty = np.sqrt(self.ridge) * np.eye(len(TERMS))[1:]
+            X = np.vstack([X, penalty])
+            y = np.concatenate([y, np.zeros(len(penalty))])
+        q, r = np.linalg.qr(X)
+        try:
+            self.coef_ = np.linalg.solve(r, q.T @ y)
+        except np.linalg.LinAlgError:
+            self.coef_ = np.linalg.lstsq(X, y, rcond=None)[0]
+        return self
+
+    def fit_frame(self, frame, incremental=False):
+        """Fit (or update, with ``incremental=True``) from a cleaned frame."""
+        X, y = design_matrix(frame), frame[TARGET_COL].to_numpy(np.float64)
+        return self.partial_fit(X, y) if incremental else self.fit(X, y)
+
+    def fit_chunks(self, chunks):
+        """Update the model from an iterable of cleaned frames."""
+        for chunk in chunks:
+            self.fit_frame(chunk, incremental=True)
+        return self
+
+    def _solve(self):
+        a = self.xtx.copy()
+        a[np.arange(1, len(a)), np.arange(1, len(a))] += self.ridge
+        try:
+            chol = np.linalg.cholesky(a)
+            return np.linalg.solve(chol.T, np.linalg.solve(chol, self.xty))
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(a, self.xty, rcond=None)[0]
+
+    def predict_rings(self, X):
+        if self.coef_ is None:
+            raise ValueError('model has not been fitted')
+        return np.asarray(X, dtype=np.float64) @ self.coef_
+
+    def predict_age(self, X):
+        return self.predict_rings(X) + AGE_OFFSET
+
+    def predict_frame(self, frame):
+        """Predicted age in years for each row of a cleaned frame."""
+        return self.predict_age(design_matrix(frame))
+
+    def training_rmse(self):
+        """RMSE on the accumulated data, computed from the statistics alone."""
+        b = self.coef_
+        rss = self.yty - 2 * b @ self.xty + b @ self.xtx @ b
+        return float(np.sqrt(max(rss, 0.0) / self.n)) if self.n else np.nan
+
+    def score(self, X, y):
+        """Coefficient of determination (R^2) of the rings prediction."""
+        y = np.asarray(y, dtype=np.float64)
+        resid = y - self.predict_rings(X)
+        return 1.0 - (resid @ resid) / ((y - y.mean()) @ (y - y.mean()))
+
+    def coefficients(self):
+        return dict(zip(TERMS, self.coef_.tolist()))
+
+    def to_dict(self):
+        return {
+            'terms': TERMS,
+            'ridge': self.ridge,
+            'n': self.n,
+            'coef': self.coef_.tolist(),
+            'xtx': self.xtx.tolist(),
+            'xty': self.xty.tolist(),
+            'yty': self.yty,
+            'cleaning': self.stats.to_dict() if self.stats else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data['terms'] != TERMS:
+            raise ValueError('model was fitted on different terms: '
+                             f"{data['terms']}")
+        stats = data.get('cleaning')
+        model = cls(ridge=data['ridge'],
+                    stats=stream.CleaningStats.from_dict(stats) if stats else None)
+        model.n = data['n']
+        model.coef_ = np.array(data['coef'])
+        model.xtx = np.array(data['xtx'])
+        model.xty = np.array(data['xty'])
+        model.yty = data['yty']
+        return model
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit_csv(path, chunksize=stream.DEFAULT_CHUNKSIZE, ridge=0.0):
+    """Fit a model on a CSV file in chunks, keeping its cleaning statistics."""
+    stats = stream.scan_stats(path, chunksize)
+    model = LinearAgeModel(ridge=ridge, stats=stats)
+    return model.fit_chunks(stream.stream_clean(path, chunksize, stats=stats))
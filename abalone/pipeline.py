@@ -0,0 +1,287 @@
+"""The notebook analysis as named, instrumented stages.
+
+``Pipeline.run`` replays the notebook in the order it is written:
+
+==========================  ==============================================
+``load``                    read the CSV
+``missing_values``          drop rows missing dimensions, mean-fill the rest
+``nonsensical_values``      negative values to NaN, median fill into num_df
+``dedup``                   drop duplicated rows
+``outliers``                1.5 x IQR rule on ``Age (y)``
+``numerical_analysis``      describe(), age mean/median/std, nunique(),
+                            per-Sex count/mean table
+``plotting``                render the report figures (when ``report_dir``
+                            is given)
+==========================  ==============================================
+
+Every stage produces a ``StageMetrics`` record (wall and CPU time, peak RSS
+of the process, rows in/out, rows dropped and values imputed) that is
+handed to each registered hook.  Hooks subclass ``StageHook``; the
+``JSONLinesExporter`` and ``PrometheusTextExporter`` write the records to
+local files.  ``profile='cprofile'`` additionally dumps a ``.prof`` file per
+stage and ``profile='tracemalloc'`` records the peak of traced allocations.
+
+    python -m abalone.pipeline abalone_growth.csv --jsonl metrics.jsonl \\
+        --prom metrics.prom --profile cprofile
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+import pandas as pd
+
+from .columns import DROPNA_COLS, MEAN_FILL_COLS, NUMERIC_COLS, SEX_COL
+
+STAGES = ['load', 'missing_values', 'nonsensical_values', 'dedup',
+          'outliers', 'numerical_analysis', 'plotting']
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mib: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    rows_dropped: int = 0
+    values_imputed: int = 0
+    started_at: float = 0.0
+    extra: dict = field(default_factory=dict)
+
+
+def peak_rss_mib():
+    """High-water mark of the process resident set size, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class StageHook:
+    """Receives every stage's metrics; override the methods you need."""
+
+    def stage_started(self, stage):
+        pass
+
+    def stage_finished(self, metrics):
+        pass
+
+    def close(self):
+        pass
+
+
+class JSONLinesExporter(StageHook):
+    """Append one JSON object per finished stage to ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def stage_finished(self, metrics):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(asdict(metrics), default=float) + '\n')
+
+
+class PrometheusTextExporter(StageHook):
+    """Keep ``path`` in the Prometheus text format (textfile collector).
+
+    The file is rewritten atomically after every stage with the latest
+    value of each metric per stage.
+    """
+
+    METRICS = [
+        ('wall_s', 'abalone_stage_wall_seconds', 'Wall time of the stage'),
+        ('cpu_s', 'abalone_stage_cpu_seconds', 'CPU time of the stage'),
+        ('peak_rss_mib', 'abalone_stage_peak_rss_mebibytes',
+         'Process peak RSS after the stage'),
+        ('rows_in', 'abalone_stage_rows_in', 'Rows entering the stage'),
+        ('rows_out', 'abalone_stage_rows_out', 'Rows leaving the stage'),
+        ('rows_dropped', 'abalone_stage_rows_dropped',
+         'Rows removed by the stage'),
+        ('values_imputed', 'abalone_stage_values_imputed',
+         'Values filled in by the stage'),
+    ]
+
+    def __init__(self, path):
+        self.path = path
+        self.latest = {}
+
+    def stage_finished(self, metrics):
+        self.latest[metrics.stage] = metrics
+        lines = []
+        for attr, name, help_text in self.METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for stage, m in self.latest.items():
+                lines.append(f'{name}{{stage="{stage}"}} {float(getattr(m, attr))}')
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.path)
+
+
+class Pipeline:
+    """Runs the notebook stages and reports metrics to ``hooks``.
+
+    ``profile`` is ``None``, ``'cprofile'`` or ``'tracemalloc'``; cProfile
+    output goes to ``profile_dir`` as ``<stage>.prof``.
+    """
+
+    def __init__(self, hooks=(), profile=None, profile_dir='.'):
+        if profile not in (None, 'cprofile', 'tracemalloc'):
+            raise ValueError(f'unknown profile mode: {profile!r}')
+        self.hooks = list(hooks)
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.metrics = []
+
+    @contextmanager
+    def stage(self, name, rows_in=0):
+        """Measure the enclosed block; the caller fills in the row counts."""
+        metrics = StageMetrics(stage=name, rows_in=rows_in,
+                               started_at=time.time())
+        for hook in self.hooks:
+            hook.stage_started(name)
+
+        profiler = None
+        if self.profile == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif self.profile == 'tracemalloc':
+            tracemalloc.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_s = time.perf_counter() - wall
+            metrics.cpu_s = time.process_time() - cpu
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                path = os.path.join(self.profile_dir, f'{name}.prof')
+                profiler.dump_stats(path)
+                metrics.extra['profile'] = path
+            elif self.profile == 'tracemalloc':
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                metrics.extra['tracemalloc_peak_mib'] = peak / 2 ** 20
+            metrics.peak_rss_mib = peak_rss_mib()
+            self.metrics.append(metrics)
+            for hook in self.hooks:
+                hook.stage_finished(metrics)
+
+    def close(self):
+        for hook in self.hooks:
+            hook.close()
+
+    def run(self, path, report_dir=None, drop_duplicates=True):
+        """Run every stage on ``path``; returns a dict of the results."""
+        out = {}
+
+        with self.stage('load') as m:
+            marine_df = pd.read_csv(path)
+            m.rows_out = len(marine_df)
+
+        with self.stage('missing_values', len(marine_df)) as m:
+            marine_df = marine_df.dropna(subset=DROPNA_COLS)
+            missing = int(marine_df[MEAN_FILL_COLS].isnull().sum().sum())
+            marine_df[MEAN_FILL_COLS] = marine_df[MEAN_FILL_COLS].fillna(
+                marine_df[MEAN_FILL_COLS].mean())
+            m.rows_out = len(marine_df)
+            m.rows_dropped = m.rows_in - m.rows_out
+            m.values_imputed = missing
+
+        with self.stage('nonsensical_values', len(marine_df)) as m:
+            negative = marine_df[NUMERIC_COLS] < 0
+            marine_df[NUMERIC_COLS] = marine_df[NUMERIC_COLS].mask(negative)
+            num_df = marine_df[NUMERIC_COLS].fillna(
+                marine_df[NUMERIC_COLS].median())
+            m.rows_out = len(num_df)
+            m.values_imputed = int(negative.to_numpy().sum())
+
+        with self.stage('dedup', len(marine_df)) as m:
+            duplicated = marine_df.duplicated()
+            m.extra['duplicates'] = int(duplicated.sum())
+            if drop_duplicates:
+                marine_df = marine_df[~duplicated]
+                num_df = num_df[~duplicated]
+            m.rows_out = len(marine_df)
+            m.rows_dropped = m.rows_in - m.rows_out
+
+        with self.stage('outliers', len(num_df)) as m:
+            age = num_df['Age (y)']
+            q1, q3 = age.quantile(0.25), age.quantile(0.75)
+            iqr = q3 - q1
+            outlier_age = (age < q1 - 1.5 * iqr) | (age > q3 + 1.5 * iqr)
+            out['outlier_age'] = outlier_age
+            m.rows_out = len(num_df)
+            m.extra['outliers'] = int(outlier_age.sum())
+
+        with self.stage('numerical_analysis', len(num_df)) as m:
+            out['describe'] = num_df.describe()
+            out['age_summary'] = {
+                'mean': num_df['Age (y)'].mean(),
+                'median': num_df['Age (y)'].median(),
+                'std': num_df['Age (y)'].std(),
+            }
+            out['nunique'] = num_df.nunique()
+            gender_group = marine_df.groupby(SEX_COL)[
+                ['Age (y)', 'Whole weight (g)']].agg(['count', 'mean']).reset_index()
+            counts = gender_group['Age (y)', 'count']
+            gender_group['Relative percentage'] = counts / counts.sum() * 100
+            out['gender_group'] = gender_group
+            m.rows_out = len(num_df)
+
+        if report_dir is not None:
+            from . import report
+
+            with self.stage('plotting', len(num_df)) as m:
+                frame = num_df.assign(**{SEX_COL: marine_df[SEX_COL]})
+                out['report'] = report.render_report(frame, report_dir)
+                m.rows_out = len(frame)
+
+        out['marine_df'] = marine_df
+        out['num_df'] = num_df
+        return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone.pipeline',
+        description='Run the abalone analysis with per-stage metrics.')
+    parser.add_argument('csv')
+    parser.add_argument('--jsonl', help='append stage metrics to this file')
+    parser.add_argument('--prom', help='write Prometheus text metrics here')
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'])
+    parser.add_argument('--profile-dir', default='profiles')
+    parser.add_argument('--report-dir', help='also render the report here')
+    args = parser.parse_args(argv)
+
+    hooks = []
+    if args.jsonl:
+        hooks.append(JSONLinesExporter(args.jsonl))
+    if args.prom:
+        hooks.append(PrometheusTextExporter(args.prom))
+    pipeline = Pipeline(hooks, args.profile, args.profile_dir)
+    try:
+        pipeline.run(args.csv, report_dir=args.report_dir)
+    finally:
+        pipeline.close()
+
+    table = pd.DataFrame([asdict(m) for m in pipeline.metrics]).drop(
+        columns=['started_at', 'extra'])
+    print(table.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Batch age prediction for streams of new measurements.
+
+Python API::
+
+    predictor = BatchPredictor.load('model.json')
+    ages = predictor.predict(frame)
+
+Command line::
+
+    python -m abalone.predict fit abalone_growth.csv -o model.json
+    python -m abalone.predict score model.json field_*.csv > scored.csv
+    cat readings.ndjson | python -m abalone.predict score model.json --format ndjson
+
+Incoming rows are cleaned with the training statistics stored in the model
+file, following the notebook rules: negative values become the median,
+missing values the mean (or the median for Length and Diameter, which the
+notebook never mean-fills).  Rows whose ``Sex`` is not F, I or M get a NaN
+prediction.  Throughput is reported on stderr.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import stream
+from .columns import AGE_OFFSET, SEX_COL
+from .model import FEATURE_COLS, SEX_LEVELS, LinearAgeModel, fit_csv
+
+DEFAULT_BATCH_SIZE = 50_000
+SEX_VALUES = ['F'] + SEX_LEVELS
+
+
+class BatchPredictor:
+    """Fitted model plus the constants needed to clean new measurements."""
+
+    def __init__(self, model):
+        if model.coef_ is None:
+            raise ValueError('model has not been fitted')
+        if model.stats is None:
+            raise ValueError('model file has no cleaning statistics; '
+                             'fit it with abalone.model.fit_csv')
+        self.model = model
+        medians = model.stats.medians
+        means = model.stats.means
+        self.medians = np.array([medians[c] for c in FEATURE_COLS])
+        self.fills = np.array([means.get(c, medians[c]) for c in FEATURE_COLS])
+
+        # Split the coefficients once so scoring is a single matrix product
+        coef = model.coef_
+        self.intercept = coef[0] + AGE_OFFSET
+        self.weights = coef[1:1 + len(FEATURE_COLS)]
+        sex_coef = [0.0] + coef[1 + len(FEATURE_COLS):].tolist()
+        self.sex_effects = dict(zip(SEX_VALUES, sex_coef))
+
+    @classmethod
+    def load(cls, path):
+        return cls(LinearAgeModel.load(path))
+
+    def clean(self, values):
+        """Apply the notebook repair rules in place to a feature block."""
+        missing = np.isnan(values)
+        np.copyto(values, np.broadcast_to(self.fills, values.shape),
+                  where=missing)
+        np.copyto(values, np.broadcast_to(self.medians, values.shape),
+                  where=values < 0)
+        return values
+
+    def predict(self, frame):
+        """Predicted age in years for every row of ``frame``.
+
+        Absent feature columns are treated as missing values and filled
+        like NaN cells; without a ``Sex`` column every prediction is NaN.
+        """
+        values = frame.reindex(columns=FEATURE_COLS).to_numpy(
+            dtype=np.float64, na_value=np.nan, copy=True)
+        self.clean(values)
+        sex = frame.get(SEX_COL)
+        if sex is None:
+            offsets = np.full(len(frame), np.nan)
+        else:
+            offsets = sex.map(self.sex_effects).to_numpy(
+                dtype=np.float64, na_value=np.nan)
+        return values @ self.weights + self.intercept + offsets
+
+    def score_batches(self, batches):
+        """Yield each batch with an ``Age (pred)`` column added."""
+        for batch in batches:
+            batch = batch.copy()
+            batch['Age (pred)'] = self.predict(batch)
+            yield batch
+
+
+def read_batches(source, fmt='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Iterate over a CSV or NDJSON file (or stdin for '-') in batches."""
+    handle = sys.stdin if source == '-' else source
+    if fmt == 'ndjson':
+        return pd.read_json(handle, lines=True, chunksize=batch_size)
+    return pd.read_csv(handle, chunksize=batch_size)
+
+
+def write_batch(batch, out, fmt, header):
+    if fmt == 'ndjson':
+        batch.to_json(out, orient='records', lines=True)
+    else:
+        batch.to_csv(out, header=header, index=False)
+
+
+def score(model_path, sources, fmt='csv', batch_size=DEFAULT_BATCH_SIZE,
+          out=None, log=None):
+    """Score every source into ``out`` and return (rows, seconds)."""
+    out = out or sys.stdout
+    log = log or sys.stderr
+    predictor = BatchPredictor.load(model_path)
+    rows = 0
+    header = True
+    start = time.perf_counter()
+    for source in sources:
+        batches = read_batches(source, fmt, batch_size)
+        for batch in predictor.score_batches(batches):
+            write_batch(batch, out, fmt, header)
+            header = False
+            rows += len(batch)
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    print(f'scored {rows} rows in {elapsed:.3f}s ({rate:,.0f} rows/sec)',
+          file=log)
+    return rows, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone.predict',
+        description='Fit and apply the abalone age model.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fit_p = sub.add_parser('fit', help='fit a model on a cleaned-on-the-fly CSV')
+    fit_p.add_argument('csv')
+    fit_p.add_argument('-o', '--output', default='model.json')
+    fit_p.add_argument('--chunksize', type=int, default=stream.DEFAULT_CHUNKSIZE)
+    fit_p.add_argument('--ridge', type=float, default=0.0)
+
+    score_p = sub.add_parser('score', help='predict age for new measurements')
+    score_p.add_argument('model')
+    score_p.add_argument('inputs', nargs='*', default=['-'],
+                         help="CSV/NDJSON files, '-' for stdin (default)")
+    score_p.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    score_p.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    score_p.add_argument('-o', '--output', help='output file (default stdout)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'fit':
+        model = fit_csv(args.csv, args.chunksize, ridge=args.ridge)
+        model.save(args.output)
+        print(f'fitted on {model.n} rows, training RMSE '
+              f'{model.training_rmse():.3f} rings -> {args.output}',
+              file=sys.stderr)
+        return 0
+
+    if args.output:
+        with open(args.output, 'w', newline='') as out:
+            score(args.model, args.inputs, args.format, args.batch_size, out)
+    else:
+        score(args.model, args.inputs, args.format, args.batch_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
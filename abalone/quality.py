@@ -0,0 +1,148 @@
+"""Single-pass data-quality checks and repair on a NumPy block.
+
+The notebook scans ``marine_df`` many times (``isnull().sum()``,
+``count()``, two ``< 0`` frames, the NaN assignment, ``fillna`` and
+``duplicated()``), copying the frame at most of those steps.  ``assess``
+computes the same information from one float64 block of the numeric
+columns: the missing and negative masks are built once and reused for the
+report, the repair statistics and the in-place repair of a single output
+array.
+
+Problems found on each row are stored as bit flags in ``row_flags``:
+
+==================  =====================================================
+``MISSING_DIM``     Length, Diameter or Height missing (row is dropped)
+``MISSING``         any other value missing (filled with the column mean)
+``NEGATIVE``        any negative value (replaced with the column median)
+``ZERO_HEIGHT``     Height recorded as exactly 0.0
+``DUPLICATE``       identical to an earlier row
+==================  =====================================================
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .columns import DROPNA_COLS, MEAN_FILL_COLS, NUMERIC_COLS, SEX_COL
+
+MISSING_DIM = 1
+MISSING = 2
+NEGATIVE = 4
+ZERO_HEIGHT = 8
+DUPLICATE = 16
+
+
+@dataclass
+class QualityReport:
+    """Counts, repair statistics and per-row flags from ``assess``."""
+
+    columns: list
+    n_rows: int
+    n_kept: int
+    missing: np.ndarray
+    negative: np.ndarray
+    zero_height: int
+    duplicates: int
+    means: dict
+    medians: dict
+    row_flags: np.ndarray
+
+    def to_frame(self):
+        """Per-column summary, like ``isnull().sum()`` next to ``(< 0).sum()``."""
+        return pd.DataFrame({
+            'missing': self.missing,
+            'negative': self.negative,
+            'mean fill': pd.Series(self.means, dtype=float),
+            'median fill': pd.Series(self.medians, dtype=float),
+        }, index=pd.Index(self.columns))
+
+    def rows_with(self, flag):
+        """Positions of the rows carrying ``flag``."""
+        return np.flatnonzero(self.row_flags & flag)
+
+
+def _duplicated(block, sex_codes=None):
+    """Boolean mask of rows equal to an earlier row (``keep='first'``)."""
+    if sex_codes is not None:
+        block = np.column_stack([block, sex_codes])
+    block = np.ascontiguousarray(block)
+    rows = block.view(np.dtype((np.void, block.dtype.itemsize * block.shape[1])))
+    _, first, inverse = np.unique(
+        rows.ravel(), return_index=True, return_inverse=True)
+    return first[inverse.ravel()] != np.arange(len(block))
+
+
+def assess(block, columns=NUMERIC_COLS, sex_codes=None):
+    """Check and repair ``block`` (rows x ``columns``) in one pass.
+
+    Returns ``(report, repaired)`` where ``repaired`` holds only the kept
+    rows with missing values mean-filled and negatives median-filled,
+    following the notebook's order of operations.  ``block`` itself is
+    not modified.
+    """
+    block = np.asarray(block, dtype=np.float64)
+    columns = list(columns)
+    n_cols = len(columns)
+    dim_idx = [columns.index(c) for c in DROPNA_COLS if c in columns]
+    fill_cols = np.isin(columns, MEAN_FILL_COLS)
+
+    nan = np.isnan(block)
+    with np.errstate(invalid='ignore'):
+        neg = block < 0
+
+    flags = np.zeros(len(block), dtype=np.uint8)
+    drop = nan[:, dim_idx].any(axis=1)
+    flags[drop] |= MISSING_DIM
+    flags[nan.any(axis=1) & ~drop] |= MISSING
+    flags[neg.any(axis=1)] |= NEGATIVE
+    if 'Height (mm)' in columns:
+        flags[block[:, columns.index('Height (mm)')] == 0.0] |= ZERO_HEIGHT
+    dup = _duplicated(block, sex_codes)
+    flags[dup] |= DUPLICATE
+
+    keep = ~drop
+    repaired = block[keep]
+    nan_kept, neg_kept = nan[keep], neg[keep]
+
+    # Means are taken before negatives are removed, as in the notebook
+    counts = (~nan_kept).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(nan_kept, 0.0, repaired).sum(axis=0) / counts
+    means[~fill_cols] = np.nan
+    np.copyto(repaired, np.broadcast_to(means, repaired.shape),
+              where=nan_kept & fill_cols)
+
+    np.copyto(repaired, np.nan, where=neg_kept)
+    if len(repaired):
+        medians = np.nanmedian(repaired, axis=0)
+    else:
+        medians = np.full(n_cols, np.nan)
+    np.copyto(repaired, np.broadcast_to(medians, repaired.shape),
+              where=neg_kept)
+
+    report = QualityReport(
+        columns=columns,
+        n_rows=len(block),
+        n_kept=int(keep.sum()),
+        missing=nan.sum(axis=0),
+        negative=neg.sum(axis=0),
+        zero_height=int((flags & ZERO_HEIGHT).astype(bool).sum()),
+        duplicates=int(dup.sum()),
+        means={c: float(m) for c, m, f in zip(columns, means, fill_cols) if f},
+        medians=dict(zip(columns, medians.tolist())),
+        row_flags=flags,
+    )
+    return report, repaired
+
+
+def assess_frame(frame, columns=NUMERIC_COLS):
+    """Run ``assess`` on a DataFrame such as the raw ``marine_df``.
+
+    ``Sex`` takes part in duplicate detection when present.
+    """
+    block = frame[list(columns)].to_numpy(dtype=np.float64)
+    sex_codes = None
+    if SEX_COL in frame:
+        sex_codes = pd.Categorical(frame[SEX_COL]).codes.astype(np.float64)
+    return assess(block, columns, sex_codes=sex_codes)
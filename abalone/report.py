@@ -0,0 +1,381 @@
+"""Headless rendering of the notebook figures into HTML and PDF reports.
+
+The notebook draws every figure with ``plt.show()`` and the reports are
+exported by hand.  Here each figure is a plain function from a dict of
+NumPy arrays to a ``matplotlib.figure.Figure`` drawn on the Agg canvas, so
+no display, pyplot state or notebook kernel is involved.  Figures are
+rendered to PNG on a process pool and cached under ``cache_dir`` by a hash
+of the figure name and its input arrays; a rerun over unchanged data only
+reassembles the documents.
+
+Figures are drawn from pre-binned aggregates (``abalone.binning``) rather
+than raw columns, so rendering time does not grow with the dataset.
+
+    python -m abalone.report abalone_growth.csv -o report/ --title "Region A"
+"""
+
+import argparse
+import base64
+import hashlib
+import html
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import binning
+from .columns import SEX_COL
+from .sketch import SketchSet
+
+DEFAULT_CACHE_DIR = os.path.join('.abalone_cache', 'figures')
+
+# Bump when a figure function changes so cached images are redrawn
+FIGURE_VERSION = 2
+
+MAIN_COLS = ['Height (mm)', 'Whole weight (g)', 'Age (y)', 'Rings']
+
+SEX_LABELS = {'M': 'Male', 'F': 'Female', 'I': 'Infant'}
+
+# Bins of the 2-D grid replacing the Rings/Age scatter
+DENSITY_BINS = 60
+BOX_SKETCH_K = 1000
+
+
+def _figure(figsize):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _box(data, col):
+    whislo, q1, med, q3, whishi = data[f'{col}|box']
+    return {'whislo': whislo, 'q1': q1, 'med': med, 'q3': q3,
+            'whishi': whishi, 'fliers': data[f'{col}|fliers']}
+
+
+def histogram_grid(data):
+    fig = _figure((12.4, 8.4))
+    axes = fig.subplots(2, 2).flatten()
+    for ax, col in zip(axes, MAIN_COLS):
+        binning.draw_histogram(
+            ax, data[f'{col}|counts'], data[f'{col}|edges'],
+            color='#0e6655', edgecolor='black', alpha=0.5, lw=2)
+        ax.set_title(f'Histogram of {col}')
+        ax.set_xlabel(col)
+        ax.set_ylabel('Frequency')
+    fig.tight_layout()
+    return fig
+
+
+def box_grid(data):
+    fig = _figure((12.4, 8.4))
+    axes = fig.subplots(2, 2).flatten()
+    for ax, col in zip(axes, MAIN_COLS):
+        binning.draw_box(ax, _box(data, col))
+        ax.set_title(f'Box plot of {col}')
+        ax.set_xlabel(col)
+    fig.tight_layout()
+    return fig
+
+
+def age_box(data):
+    fig = _figure((10.4, 6.4))
+    ax = fig.subplots()
+    binning.draw_box(ax, _box(data, 'Age (y)'), orientation='horizontal')
+    ax.set_title('Box Plot of Age Measurements', color='#0c483c')
+    ax.set_ylabel('Age', color='#0e6655')
+    ax.grid(True)
+    return fig
+
+
+def rings_age_density(data):
+    fig = _figure((10, 6))
+    ax = fig.subplots()
+    mesh = binning.draw_density(ax, data['means'], data['x_edges'],
+                                data['y_edges'], cmap='BrBG')
+    ax.set_xlabel('Rings')
+    ax.set_ylabel('Age (y)')
+    fig.colorbar(mesh, ax=ax, label='Mean whole weight (grams)')
+    ax.set_title('Correlation between Rings and Age (y) mapping by Whole weight',
+                 color='#0b5345')
+    return fig
+
+
+def rings_analysis(data):
+    fig = _figure((12, 6))
+    hist_ax, box_ax = fig.subplots(1, 2)
+    binning.draw_histogram(
+        hist_ax, data['Rings|counts'], data['Rings|edges'],
+        edgecolor='black', lw=2, alpha=0.7, color='#a2d9ce')
+    hist_ax.set_title('Histogram of Rings')
+    hist_ax.set_xlabel('Rings')
+    hist_ax.set_ylabel('Frequency')
+    binning.draw_box(box_ax, _box(data, 'Rings'))
+    box_ax.set_title('Box plot for Rings')
+    box_ax.set_xlabel('Rings')
+    fig.tight_layout()
+    return fig
+
+
+def age_by_sex(data):
+    fig = _figure((10, 6))
+    ax = fig.subplots()
+    styles = [('M', 0.6, 'darkslategrey'), ('F', 0.7, 'teal'),
+              ('I', 0.8, 'lightcyan')]
+    for sex, alpha, color in styles:
+        binning.draw_histogram(
+            ax, data[f'{sex}|counts'], data['edges'], alpha=alpha,
+            label=SEX_LABELS[sex], color=color, edgecolor='black')
+    ax.set_title('Age Distribution by Sex', size=20, color='darkslategrey')
+    ax.set_xlabel('Age')
+    ax.set_ylabel('Frequency')
+    ax.legend(fontsize=15)
+    fig.tight_layout()
+    return fig
+
+
+def sex_counts(data):
+    fig = _figure((12, 8))
+    ax = fig.subplots()
+    levels, counts = data['levels'], data['counts']
+    ax.bar(levels, counts, color=['#d0ece7', '#73c6b6', '#117a65'][:len(levels)],
+           alpha=0.5, edgecolor='black')
+    ax.set_xlabel('Sex', color='r')
+    ax.set_ylabel('Count of sex', color='b')
+    ax.set_title('Count abalone by sex')
+    return fig
+
+
+# name -> (title, figure function), in report order
+FIGURES = {
+    'age_box': ('Box plot of age', age_box),
+    'histograms': ('Histograms of the main measurements', histogram_grid),
+    'boxplots': ('Box plots of the main measurements', box_grid),
+    'rings_age': ('Rings versus age', rings_age_density),
+    'rings': ('Ring analysis', rings_analysis),
+    'age_by_sex': ('Age distribution by sex', age_by_sex),
+    'sex_counts': ('Count of abalone by sex', sex_counts),
+}
+
+
+def frame_chunks(frame, chunksize=1_000_000):
+    """Slices of an in-memory frame, for ``aggregate``."""
+    return lambda: (frame.iloc[i:i + chunksize]
+                    for i in range(0, len(frame), chunksize))
+
+
+def aggregate(chunks):
+    """Reduce cleaned data to the binned inputs of every figure.
+
+    ``chunks`` is a callable returning a fresh iterator of cleaned frames
+    with ``Sex``; it is consumed twice.  The first pass fills quantile
+    sketches (box plots, value ranges), the second fills the histograms
+    and the Rings/Age grid on edges fixed by the first.
+    """
+    sketches = SketchSet(MAIN_COLS, by=None, k=BOX_SKETCH_K)
+    for chunk in chunks():
+        sketches.update(chunk)
+
+    def edges(col, bins):
+        sketch = sketches.sketch(col)
+        return binning.fixed_edges(sketch.min, sketch.max, bins)
+
+    hists = {col: binning.Histogram(edges(col, 30)) for col in MAIN_COLS}
+    rings_hist = binning.Histogram(edges('Rings', 25))
+    sex_edges = edges('Age (y)', 10)
+    sex_hists = {sex: binning.Histogram(sex_edges) for sex in SEX_LABELS}
+    density = binning.Histogram2D(edges('Rings', DENSITY_BINS),
+                                  edges('Age (y)', DENSITY_BINS))
+    sex_totals = {}
+
+    for chunk in chunks():
+        for col, hist in hists.items():
+            hist.update(chunk[col].to_numpy(np.float64))
+        rings_hist.update(chunk['Rings'].to_numpy(np.float64))
+        density.update(chunk['Rings'].to_numpy(np.float64),
+                       chunk['Age (y)'].to_numpy(np.float64),
+                       chunk['Whole weight (g)'].to_numpy(np.float64))
+        sex = chunk[SEX_COL].to_numpy()
+        age = chunk['Age (y)'].to_numpy(np.float64)
+        for level, hist in sex_hists.items():
+            hist.update(age[sex == level])
+        levels, counts = np.unique(sex.astype(str), return_counts=True)
+        for level, count in zip(levels.tolist(), counts.tolist()):
+            sex_totals[level] = sex_totals.get(level, 0) + count
+
+    def box(col):
+        stats = binning.box_summary(sketches.sketch(col))
+        return {f'{col}|box': np.array([stats[k] for k in
+                                        ('whislo', 'q1', 'med', 'q3', 'whishi')]),
+                f'{col}|fliers': stats['fliers']}
+
+    def hist_arrays(col, hist):
+        return {f'{col}|counts': hist.counts, f'{col}|edges': hist.edges}
+
+    inputs = {
+        'age_box': box('Age (y)'),
+        'histograms': {},
+        'boxplots': {},
+        'rings_age': {'means': density.means(), 'x_edges': density.x_edges,
+                      'y_edges': density.y_edges},
+        'rings': dict(hist_arrays('Rings', rings_hist), **box('Rings')),
+        'age_by_sex': {'edges': sex_edges},
+        'sex_counts': {'levels': np.array(sorted(sex_totals), dtype=object),
+                       'counts': np.array([sex_totals[k]
+                                           for k in sorted(sex_totals)])},
+    }
+    for col, hist in hists.items():
+        inputs['histograms'].update(hist_arrays(col, hist))
+        inputs['boxplots'].update(box(col))
+    for sex, hist in sex_hists.items():
+        inputs['age_by_sex'][f'{sex}|counts'] = hist.counts
+    return inputs
+
+
+def figure_inputs(frame, names=None, chunksize=1_000_000):
+    """Binned input arrays of each figure for a cleaned frame with ``Sex``."""
+    inputs = aggregate(frame_chunks(frame, chunksize))
+    return {name: inputs[name] for name in (names or FIGURES)}
+
+
+def figure_key(name, data):
+    """Cache key of one figure: its name, version and input arrays."""
+    digest = hashlib.sha256(f'{name}:{FIGURE_VERSION}'.encode())
+    for col in sorted(data):
+        values = np.asarray(data[col])
+        if values.dtype == object:
+            values = values.astype(str)
+        digest.update(col.encode())
+        digest.update(str(values.dtype).encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def render_png(name, data, dpi=100):
+    """Draw one figure and return it as PNG bytes."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    _, draw = FIGURES[name]
+    fig = draw(data)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+def render_figures(inputs, cache_dir=DEFAULT_CACHE_DIR, max_workers=None,
+                   dpi=100):
+    """Return ``{name: png bytes}``, rendering only uncached figures."""
+    os.makedirs(cache_dir, exist_ok=True)
+    images, missing = {}, {}
+    for name, data in inputs.items():
+        path = os.path.join(cache_dir, figure_key(name, data) + '.png')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                images[name] = f.read()
+        else:
+            missing[name] = path
+
+    if missing:
+        names = list(missing)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            rendered = pool.map(render_png, names,
+                                [inputs[n] for n in names],
+                                [dpi] * len(names))
+            for name, png in zip(names, rendered):
+                tmp = missing[name] + f'.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(png)
+                os.replace(tmp, missing[name])
+                images[name] = png
+    return {name: images[name] for name in inputs}
+
+
+def write_html(images, path, title):
+    parts = [
+        '<!DOCTYPE html>',
+        f'<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+        '</head><body>',
+        f'<h1>{html.escape(title)}</h1>',
+    ]
+    for name, png in images.items():
+        encoded = base64.b64encode(png).decode('ascii')
+        parts.append(f'<h2>{html.escape(FIGURES[name][0])}</h2>')
+        parts.append(f'<img alt="{html.escape(name)}" '
+                     f'src="data:image/png;base64,{encoded}">')
+    parts.append('</body></html>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return path
+
+
+def write_pdf(images, path, title):
+    """One page per figure, built from the rendered PNGs."""
+    import matplotlib.image as mpimg
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(path) as pdf:
+        info = pdf.infodict()
+        info['Title'] = title
+        for name, png in images.items():
+            image = mpimg.imread(io.BytesIO(png), format='png')
+            height, width = image.shape[:2]
+            page = _figure((width / 100, height / 100 + 0.5))
+            page.figimage(image, yo=0)
+            page.suptitle(FIGURES[name][0])
+            pdf.savefig(page)
+    return path
+
+
+def render_report(data, out_dir, title='Abalone report', formats=('html', 'pdf'),
+                  cache_dir=DEFAULT_CACHE_DIR, max_workers=None, names=None):
+    """Render every figure and assemble the report files.
+
+    ``data`` is either a cleaned frame with ``Sex`` or the output of
+    ``aggregate``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    inputs = data if isinstance(data, dict) else figure_inputs(data)
+    inputs = {name: inputs[name] for name in (names or FIGURES)}
+    images = render_figures(inputs, cache_dir, max_workers)
+    written = []
+    if 'html' in formats:
+        written.append(write_html(images, os.path.join(out_dir, 'report.html'),
+                                  title))
+    if 'pdf' in formats:
+        written.append(write_pdf(images, os.path.join(out_dir, 'report.pdf'),
+                                 title))
+    return written
+
+
+def main(argv=None):
+    from . import stream
+
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone.report',
+        description='Render the abalone figures into HTML/PDF without a notebook.')
+    parser.add_argument('csv')
+    parser.add_argument('-o', '--output', default='report')
+    parser.add_argument('--title', default='Abalone report')
+    parser.add_argument('--format', action='append', choices=['html', 'pdf'],
+                        help='output format (repeatable, default both)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    stats = stream.scan_stats(args.csv)
+    inputs = aggregate(lambda: stream.stream_clean(args.csv, stats=stats))
+    for path in render_report(inputs, args.output, args.title,
+                              args.format or ('html', 'pdf'),
+                              args.cache_dir, args.workers):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Compact column types for abalone data.
+
+``pd.read_csv`` infers float64 for every numeric column (``Rings`` only
+because it contains NaNs) and Python strings for ``Sex``.  The compact
+schema stores
+
+* the seven measurements as float32
+* ``Rings`` as a nullable ``Int16``
+* ``Sex`` as a categorical with the levels F, I and M
+* ``Age (y)`` either as float32 or, with ``derive_age=True``, not at all:
+  ``with_age`` recomputes it as ``Rings + 1.5`` when needed
+
+which brings a specimen from 81 bytes (more where ``Sex`` is held as
+Python string objects) down to 36 bytes, or 32 without the stored age.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .columns import AGE_OFFSET, ALL_COLS, SEX_COL
+
+MEASUREMENT_COLS = [
+    'Length (mm)', 'Diameter (mm)', 'Height (mm)',
+    'Whole weight (g)', 'Shucked weight (g)',
+    'Viscera weight (g)', 'Shell weight (g)']
+
+FLOAT_DTYPE = np.float32
+RINGS_DTYPE = pd.Int16Dtype()
+SEX_DTYPE = pd.CategoricalDtype(['F', 'I', 'M'])
+
+
+def dtypes(derive_age=False):
+    """Column -> dtype mapping for ``pd.read_csv(dtype=...)``."""
+    types = {SEX_COL: SEX_DTYPE, 'Rings': RINGS_DTYPE}
+    types.update({c: FLOAT_DTYPE for c in MEASUREMENT_COLS})
+    if not derive_age:
+        types['Age (y)'] = FLOAT_DTYPE
+    return types
+
+
+def columns(derive_age=False):
+    """Columns kept under the schema, in file order."""
+    return [c for c in ALL_COLS if not (derive_age and c == 'Age (y)')]
+
+
+def read_csv_kwargs(derive_age=False):
+    """Keyword arguments applying the schema at parse time."""
+    keep = set(columns(derive_age))
+    return {'dtype': dtypes(derive_age), 'usecols': lambda c: c in keep}
+
+
+def read_csv(path, derive_age=False, **kwargs):
+    """``pd.read_csv`` with the compact schema applied while parsing."""
+    return pd.read_csv(path, **read_csv_kwargs(derive_age), **kwargs)
+
+
+def apply(frame, derive_age=False):
+    """Cast an already loaded frame to the compact schema."""
+    frame = frame[[c for c in columns(derive_age) if c in frame]]
+    types = {c: t for c, t in dtypes(derive_age).items() if c in frame}
+    if 'Rings' in types and frame['Rings'].dtype.kind == 'f':
+        # Mean-filled ring counts are fractional; the schema keeps counts
+        frame = frame.assign(Rings=frame['Rings'].round())
+    return frame.astype(types)
+
+
+def with_age(frame):
+    """Return ``frame`` with ``Age (y)`` derived from ``Rings``."""
+    age = frame['Rings'].astype(FLOAT_DTYPE) + FLOAT_DTYPE(AGE_OFFSET)
+    return frame.assign(**{'Age (y)': age})
+
+
+def fill_values(frame, values):
+    """Fill constants for ``frame``'s columns, rounded for integer columns."""
+    fills = {}
+    for column, value in values.items():
+        if column not in frame:
+            continue
+        if pd.api.types.is_integer_dtype(frame[column].dtype) and np.isfinite(value):
+            value = int(round(value))
+        fills[column] = value
+    return fills
+
+
+def bytes_per_row(frame):
+    """Average memory per specimen, including object payloads."""
+    return frame.memory_usage(deep=True, index=False).sum() / max(len(frame), 1)
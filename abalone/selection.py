@@ -0,0 +1,191 @@
+"""K-fold cross-validation over the notebook's cleaning choices.
+
+The notebook fixes its cleaning by hand: drop rows missing Length, Diameter
+or Height, mean-fill the rest, median-fill negatives and treat ages beyond
+1.5 x IQR as outliers.  ``cross_validate`` measures how those choices (and
+alternatives) change the error of a linear rings model.
+
+Each ``Candidate`` combines
+
+* ``missing``: ``'mean'`` (the notebook), ``'median'`` or ``'drop'`` (drop
+  every row with a missing value)
+* ``negative``: ``'median'`` (the notebook), ``'mean'`` or ``'drop'``
+* ``outlier_k``: drop training rows whose age lies beyond k x IQR, or
+  ``None`` to keep them all
+* ``features``: a key of ``FEATURE_SETS``
+
+Cleaning statistics are learned on the training folds only and reused on
+the held-out fold.  Held-out rows are scored only where the true ``Rings``
+was recorded and non-negative; their missing or negative features are
+filled with the training statistics (medians for the ``'drop'``
+strategies), so every candidate is scored on the same rows.
+
+Every (candidate, fold) pair runs as a task on a process pool.  The raw
+numeric block is placed in shared memory once (``abalone.shared``) and
+workers attach to it and rebuild the fold indices from ``k`` and ``seed``,
+so a task is only a (candidate, fold) pair.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from . import shared
+from .columns import DROPNA_COLS, NUMERIC_COLS, SEX_COL
+from .model import FEATURE_COLS, SEX_LEVELS
+
+FEATURE_SETS = {
+    'all': FEATURE_COLS,
+    'dimensions': ['Length (mm)', 'Diameter (mm)', 'Height (mm)'],
+    'weights': ['Whole weight (g)', 'Shucked weight (g)',
+                'Viscera weight (g)', 'Shell weight (g)'],
+    'shell': ['Shell weight (g)'],
+}
+
+SEX_CATEGORIES = ['F'] + SEX_LEVELS
+_TARGET = NUMERIC_COLS.index('Rings')
+_AGE = NUMERIC_COLS.index('Age (y)')
+_DIMS = [NUMERIC_COLS.index(c) for c in DROPNA_COLS]
+
+
+@dataclass(frozen=True)
+class Candidate:
+    missing: str = 'mean'
+    negative: str = 'median'
+    outlier_k: float = 1.5
+    features: str = 'all'
+
+
+def candidate_grid(missing=('mean', 'median', 'drop'),
+                   negative=('median', 'mean', 'drop'),
+                   outlier_k=(None, 1.5, 3.0),
+                   features=tuple(FEATURE_SETS)):
+    """Every combination of the given options."""
+    return [Candidate(*combo)
+            for combo in itertools.product(missing, negative, outlier_k, features)]
+
+
+def _column_stat(values, how):
+    with np.errstate(invalid='ignore'):
+        if how == 'mean':
+            return np.nanmean(values, axis=0)
+        return np.nanmedian(values, axis=0)
+
+
+def _clean_train(block, sex, cand):
+    """Clean training rows; returns (values, sex, missing fill, negative fill)."""
+    nan = np.isnan(block)
+    if cand.missing == 'drop':
+        keep = ~nan.any(axis=1)
+        block, sex = block[keep], sex[keep]
+        missing_fill = _column_stat(block, 'median')
+    else:
+        keep = ~nan[:, _DIMS].any(axis=1)
+        block, sex = block[keep], sex[keep]
+        missing_fill = _column_stat(block, cand.missing)
+        block = np.where(np.isnan(block), missing_fill, block)
+
+    neg = block < 0
+    if cand.negative == 'drop':
+        keep = ~neg.any(axis=1)
+        block, sex = block[keep], sex[keep]
+        negative_fill = _column_stat(block, 'median')
+    else:
+        negative_fill = _column_stat(np.where(neg, np.nan, block), cand.negative)
+        block = np.where(neg, negative_fill, block)
+    return block, sex, missing_fill, negative_fill
+
+
+def _design(values, sex, cols):
+    idx = [NUMERIC_COLS.index(c) for c in cols]
+    dummies = [(sex == SEX_CATEGORIES.index(s)) for s in SEX_LEVELS]
+    return np.column_stack([np.ones(len(values)), values[:, idx]] + dummies)
+
+
+def evaluate_fold(block, sex, train_idx, test_idx, cand):
+    """Train on ``train_idx`` and return (rmse, mae, n_test) on ``test_idx``."""
+    values, train_sex, missing_fill, negative_fill = _clean_train(
+        block[train_idx], sex[train_idx], cand)
+
+    if cand.outlier_k is not None and len(values):
+        q1, q3 = np.percentile(values[:, _AGE], [25, 75])
+        spread = cand.outlier_k * (q3 - q1)
+        ok = (values[:, _AGE] >= q1 - spread) & (values[:, _AGE] <= q3 + spread)
+        values, train_sex = values[ok], train_sex[ok]
+
+    cols = FEATURE_SETS[cand.features]
+    X = _design(values, train_sex, cols)
+    coef = np.linalg.lstsq(X, values[:, _TARGET], rcond=None)[0]
+
+    test = block[test_idx]
+    truth = test[:, _TARGET]
+    scored = ~np.isnan(truth) & (truth >= 0)
+    test, truth = test[scored], truth[scored]
+    test = np.where(np.isnan(test), missing_fill, test)
+    test = np.where(test < 0, negative_fill, test)
+    resid = truth - _design(test, sex[test_idx][scored], cols) @ coef
+    return (float(np.sqrt(np.mean(resid ** 2))), float(np.mean(np.abs(resid))),
+            int(len(resid)))
+
+
+# Worker-side views of the shared dataset, set by _attach_worker
+_worker = {}
+
+
+def _attach_worker(handle, k, seed):
+    data = shared.attach(handle)
+    _worker['block'] = data.values
+    _worker['sex'] = data.sex
+    # Rebuilt once per worker, so tasks only carry (candidate, fold)
+    _worker['folds'] = kfold_indices(len(data), k, seed)
+
+
+def _run_task(task):
+    cand, fold = task
+    train_idx, test_idx = _worker['folds'][fold]
+    rmse, mae, n = evaluate_fold(_worker['block'], _worker['sex'],
+                                 train_idx, test_idx, cand)
+    return cand, fold, rmse, mae, n
+
+
+def kfold_indices(n_rows, k=5, seed=0):
+    """Shuffled (train, test) index pairs for k folds."""
+    order = np.random.default_rng(seed).permutation(n_rows)
+    folds = np.array_split(order, k)
+    return [(np.concatenate(folds[:i] + folds[i + 1:]), folds[i])
+            for i in range(k)]
+
+
+def cross_validate(frame, candidates=None, k=5, seed=0, max_workers=None):
+    """Score every candidate with k-fold CV on the raw ``marine_df``.
+
+    Returns one row per candidate with mean and standard deviation of the
+    held-out RMSE and MAE (in rings), best candidate first.
+    """
+    candidates = candidates or candidate_grid()
+    block = frame[NUMERIC_COLS].to_numpy(dtype=np.float64)
+    sex = shared.sex_codes(frame[SEX_COL])
+    tasks = [(cand, fold) for cand in candidates for fold in range(k)]
+
+    with shared.SharedDataset.from_arrays(block, sex, NUMERIC_COLS) as data:
+        workers = max_workers or os.cpu_count()
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach_worker,
+                initargs=(data.handle, k, seed)) as pool:
+            chunksize = max(1, len(tasks) // (4 * workers))
+            results = list(pool.map(_run_task, tasks, chunksize=chunksize))
+
+    rows = pd.DataFrame(
+        [dict(asdict(cand), fold=fold, rmse=rmse, mae=mae, n_test=n)
+         for cand, fold, rmse, mae, n in results])
+    keys = list(asdict(Candidate()))
+    summary = (rows.groupby(keys, dropna=False)
+               .agg(rmse=('rmse', 'mean'), rmse_std=('rmse', 'std'),
+                    mae=('mae', 'mean'), n_test=('n_test', 'sum'))
+               .reset_index()
+               .sort_values('rmse', ignore_index=True))
+    return summary
@@ -0,0 +1,320 @@
+"""Asyncio HTTP/JSON age-scoring service with micro-batching.
+
+Field tablets post one specimen at a time::
+
+    POST /predict  {"Sex": "M", "Length (mm)": 0.455, "Diameter (mm)": 0.365,
+                    "Height (mm)": 0.095, "Whole weight (g)": 0.514, ...}
+    -> {"age": 10.87}
+
+Keys may also be given as slugs (``length_mm``, ``whole_weight_g``,
+``sex``); missing or negative measurements are repaired with the training
+statistics stored in the model, as in the notebook.  A list of specimens
+gets a list of ages back.
+
+Requests arriving within ``window_ms`` of each other (up to ``max_batch``
+rows) are scored together by one call to the ``abalone.artifact`` kernel,
+so a burst from many devices costs one vectorized pass rather than one per
+request.  ``GET /metrics`` returns request, row and batch counters, p50 and
+p99 latency over the last ``LATENCY_WINDOW`` requests and throughput;
+``GET /health`` answers ``ok``.
+
+    python -m abalone.service model.bin --port 8080 --window-ms 2
+
+The model is a binary artifact (``python -m abalone.artifact export``) or
+a model JSON, which is converted on startup.  ``abalone.loadgen`` drives
+the service for local testing.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import artifact
+from .columns import SEX_COL
+from .model import FEATURE_COLS
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 512
+LATENCY_WINDOW = 10_000
+MAX_BODY = 1 << 20
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+def _slug(name):
+    # 'Whole weight (g)' -> 'whole_weight_g'
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+KEYS = {name: name for name in FEATURE_COLS + [SEX_COL]}
+KEYS.update({_slug(name): name for name in FEATURE_COLS + [SEX_COL]})
+
+
+def load_artifact(path):
+    """Memory-map ``path``, exporting it first when it is a model JSON."""
+    with open(path, 'rb') as f:
+        is_artifact = f.read(len(artifact.MAGIC)) == artifact.MAGIC
+    if not is_artifact:
+        from .model import LinearAgeModel
+
+        fd, tmp = tempfile.mkstemp(suffix='.bin')
+        os.close(fd)
+        artifact.export(LinearAgeModel.load(path), tmp)
+        model = artifact.ModelArtifact(tmp)
+        try:
+            # The mapping outlives the name on POSIX systems
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return model
+    return artifact.ModelArtifact(path)
+
+
+def parse_specimen(record):
+    """(measurements, sex code) of one JSON object."""
+    if not isinstance(record, dict):
+        raise ValueError('each specimen must be a JSON object')
+    fields = {KEYS[k]: v for k, v in record.items() if k in KEYS}
+    values = []
+    for name in FEATURE_COLS:
+        value = fields.get(name)
+        values.append(math.nan if value is None else float(value))
+    return values, artifact.SEX_CODES.get(fields.get(SEX_COL), -1)
+
+
+class Metrics:
+    """Counters plus a ring buffer of recent request latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.requests = self.errors = self.rows = self.batches = 0
+        self.latencies = np.zeros(window)
+        self.filled = 0
+
+    def observe(self, seconds):
+        self.latencies[self.requests % len(self.latencies)] = seconds
+        self.requests += 1
+        self.filled = min(self.filled + 1, len(self.latencies))
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        recent = self.latencies[:self.filled]
+        p50, p99 = (np.percentile(recent, [50, 99]) * 1e3 if self.filled
+                    else (0.0, 0.0))
+        return {
+            'requests': self.requests, 'errors': self.errors,
+            'rows': self.rows, 'batches': self.batches,
+            'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+            'latency_p50_ms': float(p50), 'latency_p99_ms': float(p99),
+            'uptime_s': uptime,
+            'throughput_rps': self.requests / uptime if uptime else 0.0,
+        }
+
+
+class MicroBatcher:
+    """Collects rows for up to ``window_ms`` and scores them in one call."""
+
+    def __init__(self, kernel, metrics, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.kernel = kernel
+        self.metrics = metrics
+        self.window = window_ms / 1e3
+        self.max_batch = min(max_batch, kernel.max_batch)
+        self.queue = asyncio.Queue()
+        n_features = len(FEATURE_COLS)
+        self._values = np.empty((self.max_batch, n_features), dtype=np.float32)
+        self._codes = np.empty(self.max_batch, dtype=np.intp)
+        self._out = np.empty(self.max_batch, dtype=np.float32)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def score(self, values, code):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((values, code, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            n = len(batch)
+            for i, (values, code, _) in enumerate(batch):
+                self._values[i] = values
+                self._codes[i] = code
+            try:
+                ages = self.kernel.predict_into(
+                    self._values[:n], self._codes[:n], self._out[:n]).tolist()
+            except Exception as exc:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.metrics.rows += n
+            self.metrics.batches += 1
+            for (_, _, future), age in zip(batch, ages):
+                if not future.done():
+                    future.set_result(None if math.isnan(age) else age)
+
+
+class ScoringService:
+    """HTTP/1.1 keep-alive server around a ``MicroBatcher``."""
+
+    def __init__(self, model_path, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.artifact = load_artifact(model_path)
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(self.artifact.kernel(max_batch),
+                                    self.metrics, window_ms, max_batch)
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self, host='127.0.0.1', port=8080):
+        host, port = await self.start(host, port)
+        print(f'scoring on http://{host}:{port}', file=sys.stderr)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                received = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400,
+                                        {'error': 'bad content-length'})
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': 'body too large'})
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'bad request line'})
+                    break
+                status, payload = await self._route(method, target, body)
+                if status != 200:
+                    self.metrics.errors += 1
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if target.startswith('/predict'):
+                    self.metrics.observe(time.perf_counter() - received)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        path = target.split('?', 1)[0]
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            try:
+                data = json.loads(body)
+                records = data if isinstance(data, list) else [data]
+                parsed = [parse_specimen(r) for r in records]
+            except (ValueError, TypeError) as exc:
+                return 400, {'error': str(exc)}
+            ages = await asyncio.gather(
+                *(self.batcher.score(v, c) for v, c in parsed))
+            return 200, ages if isinstance(data, list) else {'age': ages[0]}
+        if path == '/metrics' and method == 'GET':
+            return 200, self.metrics.snapshot()
+        if path == '/health' and method == 'GET':
+            return 200, 'ok'
+        return 404, {'error': f'no route for {method} {path}'}
+
+    async def _respond(self, writer, status, payload, keep_alive=False):
+        body = json.dumps(payload).encode()
+        head = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                f'Content-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m abalone.service',
+        description='Serve abalone age predictions over HTTP/JSON.')
+    parser.add_argument('model', help='model artifact (.bin) or model JSON')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS,
+                        help='how long to wait for more rows per batch')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    args = parser.parse_args(argv)
+
+    service = ScoringService(args.model, args.window_ms, args.max_batch)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
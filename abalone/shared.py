@@ -0,0 +1,235 @@
+"""Cleaned numeric block in shared memory for worker processes.
+
+Parallel jobs (figure grids in ``abalone.report``, per-``Sex`` analyses,
+the folds of ``abalone.selection``) otherwise re-read
+``abalone_growth.csv`` or receive a pickled DataFrame per task.
+``SharedDataset`` writes the numeric columns and the ``Sex`` codes into one
+``multiprocessing.shared_memory`` segment once:
+
+=============  ===========================================================
+offset         content
+=============  ===========================================================
+0              values, ``rows x columns`` of ``dtype`` (float32 by
+               default), column-major so each column is contiguous
+aligned to 64  ``Sex`` codes, int8: 0, 1, 2 for F, I, M and -1 unknown
+=============  ===========================================================
+
+Only the small, picklable ``SharedHandle`` travels to workers;
+``attach(handle)`` maps the segment (once per process) and returns
+read-only views, so nothing is copied.  The creating process owns the
+segment: it is unlinked by ``close()``, at the end of a ``with`` block,
+when the owner is garbage collected or at interpreter exit, whichever
+comes first.
+
+    with SharedDataset.from_csv('abalone_growth.csv') as data:
+        with ProcessPoolExecutor() as pool:
+            pool.map(work, itertools.repeat(data.handle, 8), range(8))
+
+    def work(handle, i):
+        data = shared.attach(handle)
+        return data.column('Age (y)')[data.sex == 2].mean()
+
+Before Python 3.13 an attaching process registers the segment with its
+resource tracker, so workers should be children of the owner (a process
+pool), which share its tracker.
+"""
+
+import weakref
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from . import stream
+from .columns import NUMERIC_COLS, SEX_COL
+
+SEX_CATEGORIES = ['F', 'I', 'M']
+ALIGNMENT = 64
+
+
+@dataclass(frozen=True)
+class SharedHandle:
+    """Everything a worker needs to attach; cheap to pickle."""
+
+    name: str
+    rows: int
+    columns: tuple
+    dtype: str
+    sex_offset: int
+
+    def attach(self):
+        return attach(self)
+
+
+def _layout(rows, n_columns, dtype):
+    """(segment size, offset of the Sex codes)."""
+    values = rows * n_columns * np.dtype(dtype).itemsize
+    sex_offset = -(-values // ALIGNMENT) * ALIGNMENT
+    return max(sex_offset + rows, 1), sex_offset
+
+
+def _open(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        return shared_memory.SharedMemory(name=name)
+
+
+def _release(segment, owner):
+    try:
+        segment.close()
+    except BufferError:
+        # Views are still alive; the mapping goes away with the process
+        pass
+    if owner:
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def sex_codes(sex):
+    """int8 codes of a ``Sex`` column in ``SEX_CATEGORIES`` order."""
+    return pd.Categorical(sex, categories=SEX_CATEGORIES).codes.astype(np.int8)
+
+
+class SharedDataset:
+    """Numeric columns plus ``Sex`` codes in one shared-memory segment.
+
+    Build one with ``from_frame``, ``from_csv`` or ``from_arrays``;
+    workers get theirs from ``attach``.  ``values`` (rows x columns),
+    ``sex`` and ``column()`` are read-only views of the segment.
+    """
+
+    def __init__(self, segment, handle, owner):
+        self.segment = segment
+        self.handle = handle
+        self.owner = owner
+        self._map()
+        self._finalizer = weakref.finalize(self, _release, segment, owner)
+
+    def _map(self):
+        handle = self.handle
+        self.values = np.ndarray((handle.rows, len(handle.columns)),
+                                 handle.dtype, self.segment.buf, order='F')
+        self.sex = np.ndarray((handle.rows,), np.int8, self.segment.buf,
+                              offset=handle.sex_offset)
+        self.values.flags.writeable = False
+        self.sex.flags.writeable = False
+
+    @classmethod
+    def _create(cls, rows, columns, dtype):
+        size, sex_offset = _layout(rows, len(columns), dtype)
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        handle = SharedHandle(segment.name, rows, tuple(columns),
+                              np.dtype(dtype).str, sex_offset)
+        return cls(segment, handle, owner=True)
+
+    def _writable(self):
+        handle = self.handle
+        values = np.ndarray(self.values.shape, handle.dtype, self.segment.buf,
+                            order='F')
+        sex = np.ndarray(self.sex.shape, np.int8, self.segment.buf,
+                         offset=handle.sex_offset)
+        return values, sex
+
+    @classmethod
+    def from_arrays(cls, values, sex, columns=NUMERIC_COLS, dtype=None):
+        """Copy a (rows x columns) block and its int8 ``Sex`` codes in."""
+        values = np.asarray(values)
+        data = cls._create(len(values), columns, dtype or values.dtype)
+        block, codes = data._writable()
+        block[:] = values
+        codes[:] = sex
+        return data
+
+    @classmethod
+    def from_frame(cls, frame, columns=NUMERIC_COLS, dtype=np.float32):
+        """The ``columns`` and ``Sex`` of an already cleaned frame."""
+        columns = [c for c in columns if c in frame]
+        data = cls._create(len(frame), columns, dtype)
+        block, codes = data._writable()
+        for j, column in enumerate(columns):
+            block[:, j] = frame[column].to_numpy(dtype=dtype, na_value=np.nan)
+        codes[:] = sex_codes(frame[SEX_COL])
+        return data
+
+    @classmethod
+    def from_csv(cls, path, columns=NUMERIC_COLS, dtype=np.float32,
+                 chunksize=stream.DEFAULT_CHUNKSIZE, stats=None, **kwargs):
+        """Clean ``path`` chunk by chunk straight into the segment.
+
+        The first pass (``stream.scan_stats``) also counts the rows left
+        after cleaning, so the segment is sized before any row is written
+        and the cleaned table never exists as one DataFrame.
+        """
+        if stats is None:
+            stats = stream.scan_stats(path, chunksize, **kwargs)
+        columns = [c for c in columns if c in stats.medians]
+        data = cls._create(stats.rows_kept, columns, dtype)
+        block, codes = data._writable()
+        start = 0
+        for chunk in stream.stream_clean(path, chunksize, stats=stats):
+            rows = slice(start, start + len(chunk))
+            for j, column in enumerate(columns):
+                block[rows, j] = chunk[column].to_numpy(
+                    dtype=dtype, na_value=np.nan)
+            codes[rows] = sex_codes(chunk[SEX_COL])
+            start += len(chunk)
+        if start != stats.rows_kept:
+            data.close()
+            raise ValueError(f'{path}: {start} cleaned rows, expected '
+                             f'{stats.rows_kept}; was the file modified?')
+        return data
+
+    @property
+    def columns(self):
+        return list(self.handle.columns)
+
+    def __len__(self):
+        return self.handle.rows
+
+    def column(self, name):
+        """Contiguous read-only view of one column."""
+        return self.values[:, self.handle.columns.index(name)]
+
+    def to_frame(self):
+        """DataFrame over the shared block (numeric columns not copied)."""
+        frame = pd.DataFrame(self.values, columns=self.columns, copy=False)
+        frame[SEX_COL] = pd.Categorical.from_codes(self.sex, SEX_CATEGORIES)
+        return frame
+
+    def close(self):
+        """Drop the views and unmap; the owner also unlinks the segment."""
+        self.values = self.sex = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __reduce__(self):
+        # Send the handle, never the data; the receiver attaches
+        return attach, (self.handle,)
+
+    def __repr__(self):
+        role = 'owner' if self.owner else 'attached'
+        return (f'SharedDataset({self.handle.name!r}, {len(self)} rows, '
+                f'{len(self.handle.columns)} columns, {role})')
+
+
+# Segments attached in this process, by name
+_attached = {}
+
+
+def attach(handle):
+    """Read-only ``SharedDataset`` for ``handle``, mapped once per process."""
+    data = _attached.get(handle.name)
+    if data is None or data.values is None:
+        data = SharedDataset(_open(handle.name), handle, owner=False)
+        _attached[handle.name] = data
+    return data
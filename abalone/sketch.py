@@ -0,0 +1,289 @@
+"""Mergeable quantile sketches for medians, IQR bounds and summaries.
+
+The notebook sorts whole columns for ``median()`` and for the age
+``quantile(0.25)``/``quantile(0.75)`` IQR check.  A ``KLLSketch`` answers
+the same questions approximately from a bounded number of stored items
+(KLL, Karnin-Lang-Liberty 2016): values enter level 0, and whenever a level
+overflows it is sorted and every other item is promoted to the next level
+with double the weight.  The rank error is roughly 1.7 / k of the stream
+length, independent of how many values were seen, and two sketches merge
+into one with the same guarantee, so summaries built by parallel workers
+or on different days can be combined.
+
+``SketchSet`` keeps one sketch plus count/sum/sum-of-squares/min/max for
+each numeric column, both overall and per ``Sex``, and answers the median
+fill, IQR bounds and a ``describe()``-style table from them.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .columns import NUMERIC_COLS, SEX_COL
+
+DEFAULT_K = 200
+_C = 2.0 / 3.0
+
+
+class KLLSketch:
+    """KLL quantile sketch over float values."""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * _C ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            items = np.sort(items)
+            # An odd item out stays behind so that total weight is exact
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            pairs = items[:len(items) - len(keep)]
+            promoted = pairs[self._rng.integers(2)::2]
+            self.levels[level] = keep
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level + 1] = np.concatenate(
+                [self.levels[level + 1], promoted])
+            # Capacities depend on the number of levels, so start over
+            level = 0
+
+    def update(self, values):
+        """Add an array of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def add_repeated(self, value, count):
+        """Add ``value`` ``count`` times in O(log count) stored items."""
+        count = int(count)
+        if count <= 0 or math.isnan(value):
+            return self
+        self.n += count
+        self.min = min(self.min, float(value))
+        self.max = max(self.max, float(value))
+        # Level h items weigh 2**h, so place one copy per set bit of count
+        level = 0
+        while count:
+            if count & 1:
+                while level >= len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = np.append(self.levels[level], value)
+            count >>= 1
+            level += 1
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(l), 1 << h, dtype=np.int64)
+             for h, l in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Quantiles with linear interpolation, like ``np.quantile``.
+
+        The stored items are treated as the multiset they represent, so the
+        result is exact as long as nothing has been compacted yet.
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.n:
+            return np.full(qs.shape, np.nan)
+        items, cum = self._weighted()
+        total = cum[-1]
+        pos = qs * (total - 1)
+        lo = np.floor(pos)
+        frac = pos - lo
+        below = items[np.searchsorted(cum, lo, side='right')]
+        above = items[np.minimum(np.searchsorted(cum, lo + 1, side='right'),
+                                 len(items) - 1)]
+        return below + frac * (above - below)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def rank(self, value):
+        """Approximate fraction of values <= ``value``."""
+        if not self.n:
+            return np.nan
+        items, cum = self._weighted()
+        i = np.searchsorted(items, value, side='right')
+        return float(cum[i - 1] / cum[-1]) if i else 0.0
+
+    def __len__(self):
+        return sum(len(l) for l in self.levels)
+
+    def to_dict(self):
+        return {
+            'k': self.k, 'n': self.n, 'min': self.min, 'max': self.max,
+            'levels': [l.tolist() for l in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data, seed=None):
+        sketch = cls(data['k'], seed=seed)
+        sketch.levels = [np.array(l, dtype=np.float64) for l in data['levels']]
+        sketch.n = data['n']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        return sketch
+
+
+class _Moments:
+    """Count, sum and sum of squares of one column."""
+
+    __slots__ = ('n', 'total', 'squares')
+
+    def __init__(self, n=0, total=0.0, squares=0.0):
+        self.n, self.total, self.squares = n, total, squares
+
+    def update(self, values):
+        self.n += len(values)
+        self.total += float(values.sum())
+        self.squares += float(values @ values)
+
+    def merge(self, other):
+        self.n += other.n
+        self.total += other.total
+        self.squares += other.squares
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else np.nan
+
+    @property
+    def std(self):
+        if self.n < 2:
+            return np.nan
+        var = (self.squares - self.total ** 2 / self.n) / (self.n - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+class SketchSet:
+    """Per-column quantile sketches and moments, overall and per group.
+
+    Group ``None`` always holds the summary of every row.
+    """
+
+    def __init__(self, columns=NUMERIC_COLS, by=SEX_COL, k=DEFAULT_K, seed=0):
+        self.columns = list(columns)
+        self.by = by
+        self.k = k
+        self._seed = np.random.SeedSequence(seed)
+        self.sketches = {}
+        self.moments = {}
+
+    def _slot(self, group, column):
+        key = (group, column)
+        if key not in self.sketches:
+            seed = self._seed.spawn(1)[0]
+            self.sketches[key] = KLLSketch(self.k, seed=seed)
+            self.moments[key] = _Moments()
+        return self.sketches[key], self.moments[key]
+
+    def update(self, frame):
+        """Add every row of ``frame``; NaNs are skipped per column."""
+        groups = [(None, frame)]
+        if self.by is not None and self.by in frame:
+            groups += list(frame.groupby(self.by, observed=True, sort=False))
+        for group, part in groups:
+            for column in self.columns:
+                values = part[column].to_numpy(dtype=np.float64)
+                values = values[~np.isnan(values)]
+                sketch, moments = self._slot(group, column)
+                sketch.update(values)
+                moments.update(values)
+        return self
+
+    def merge(self, other):
+        """Fold the summaries of another ``SketchSet`` into this one."""
+        for key, sketch in other.sketches.items():
+            mine, moments = self._slot(*key)
+            mine.merge(sketch)
+            moments.merge(other.moments[key])
+        return self
+
+    def groups(self):
+        return sorted({g for g, _ in self.sketches if g is not None})
+
+    def sketch(self, column, group=None):
+        return self._slot(group, column)[0]
+
+    def median(self, group=None):
+        """Column medians, the sketch counterpart of ``df.median()``."""
+        return {c: self.sketch(c, group).median() for c in self.columns}
+
+    def iqr_bounds(self, column, k=1.5, group=None):
+        """Lower and upper outlier fences ``Q1 - k*IQR`` and ``Q3 + k*IQR``."""
+        q1, q3 = self.sketch(column, group).quantiles([0.25, 0.75])
+        return q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+
+    def describe(self, group=None):
+        """Table shaped like ``DataFrame.describe()``."""
+        table = {}
+        for column in self.columns:
+            sketch, moments = self._slot(group, column)
+            q1, q2, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+            table[column] = [
+                moments.n, moments.mean, moments.std,
+                sketch.min if sketch.n else np.nan, q1, q2, q3,
+                sketch.max if sketch.n else np.nan]
+        return pd.DataFrame(
+            table, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%',
+                          'max'])
+
+    def to_dict(self):
+        return {
+            'columns': self.columns, 'by': self.by, 'k': self.k,
+            'entries': [
+                {'group': g, 'column': c, 'sketch': s.to_dict(),
+                 'moments': [self.moments[g, c].n, self.moments[g, c].total,
+                             self.moments[g, c].squares]}
+                for (g, c), s in self.sketches.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data, seed=0):
+        sketches = cls(data['columns'], data['by'], data['k'], seed=seed)
+        for entry in data['entries']:
+            key = (entry['group'], entry['column'])
+            sketches.sketches[key] = KLLSketch.from_dict(entry['sketch'])
+            sketches.moments[key] = _Moments(*entry['moments'])
+        return sketches
@@ -210,7 +210,7 @@ marine_df.duplicated().sum()
 
 # %%
 # remove duplicate row if any 
-marine_df.drop_duplicates()
+marine_df = marine_df.drop_duplicates()
 
 # %% [markdown]
 # <span style='color:rgb(5, 51, 42)'> IN CONCLUSION, there's no duplicates obsereved in the whole dataset </span>
@@ -575,7 +575,7 @@ plt.show()
 marine_df.columns
 
 # %%
-xyz = marine_df.groupby('Sex').mean().reset_index()
+xyz = marine_df.groupby('Sex').mean(numeric_only=True).reset_index()
 
 
 # %%
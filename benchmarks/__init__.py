@@ -0,0 +1 @@
+"""Benchmarks for the abalone analysis pipeline (``python -m benchmarks.run``)."""
@@ -0,0 +1,208 @@
+"""Time and memory-profile each stage of the abalone pipeline at scale.
+
+For each requested size a synthetic CSV is generated (``benchmarks.synth``)
+and the notebook's stages are replayed on it one at a time:
+
+    read_csv, dropna_fillna, negative_repair, duplicates,
+    describe_groupby, iqr, plot
+
+Each stage records wall time, CPU time and the peak of Python-tracked
+allocations (``tracemalloc``; NumPy and pandas report their buffers to
+it).  Results are written as JSON under ``benchmarks/results/`` named after
+the current commit, and two result files can be compared:
+
+    python -m benchmarks.run --sizes 1e4 1e5 1e6
+    python -m benchmarks.run --compare results/old.json results/new.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from abalone.columns import (DROPNA_COLS, MEAN_FILL_COLS, NUMERIC_COLS,
+                             SEX_COL)
+
+from . import synth
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+MAIN_COLS = ['Height (mm)', 'Whole weight (g)', 'Age (y)', 'Rings']
+
+
+def stage_read_csv(state):
+    state['df'] = pd.read_csv(state['path'])
+
+
+def stage_dropna_fillna(state):
+    df = state['df']
+    df.dropna(axis='index', how='any', subset=DROPNA_COLS, inplace=True)
+    df[MEAN_FILL_COLS] = df[MEAN_FILL_COLS].fillna(df[MEAN_FILL_COLS].mean())
+
+
+def stage_negative_repair(state):
+    df = state['df']
+    df[df[NUMERIC_COLS] < 0] = np.nan
+    state['num_df'] = df[NUMERIC_COLS].fillna(df[NUMERIC_COLS].median())
+
+
+def stage_duplicates(state):
+    state['duplicates'] = int(state['df'].duplicated().sum())
+
+
+def stage_describe_groupby(state):
+    state['num_df'].describe()
+    state['df'].groupby(SEX_COL)[['Age (y)', 'Whole weight (g)']].agg(
+        ['count', 'mean'])
+
+
+def stage_iqr(state):
+    age = state['num_df']['Age (y)']
+    q1, q3 = age.quantile(0.25), age.quantile(0.75)
+    iqr = q3 - q1
+    state['outliers'] = int(((age < q1 - 1.5 * iqr) | (age > q3 + 1.5 * iqr)).sum())
+
+
+def stage_plot(state):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12.4, 8.4))
+    FigureCanvasAgg(fig)
+    for ax, col in zip(fig.subplots(2, 2).flatten(), MAIN_COLS):
+        ax.hist(state['num_df'][col], bins=30)
+    fig.savefig(io.BytesIO(), format='png')
+
+
+STAGES = [
+    ('read_csv', stage_read_csv),
+    ('dropna_fillna', stage_dropna_fillna),
+    ('negative_repair', stage_negative_repair),
+    ('duplicates', stage_duplicates),
+    ('describe_groupby', stage_describe_groupby),
+    ('iqr', stage_iqr),
+    ('plot', stage_plot),
+]
+
+
+def measure(func, state, trace_memory=True):
+    """Run one stage; returns wall seconds, CPU seconds and peak MiB."""
+    if trace_memory:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    func(state)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return wall, cpu, peak
+
+
+def run_size(rows, workdir, repeat=1, trace_memory=True, seed=0,
+             profile=None):
+    path = os.path.join(workdir, f'synthetic_{rows}.csv')
+    if not os.path.exists(path):
+        synth.write_csv(path, rows, profile=profile, seed=seed)
+    results = []
+    for attempt in range(repeat):
+        state = {'path': path}
+        for name, func in STAGES:
+            wall, cpu, peak = measure(func, state, trace_memory)
+            results.append({'rows': rows, 'stage': name, 'repeat': attempt,
+                            'wall_s': wall, 'cpu_s': cpu, 'peak_mib': peak})
+            print(f'{rows:>12,} {name:<18} {wall:9.4f}s wall {cpu:9.4f}s cpu'
+                  + (f' {peak:10.1f} MiB' if peak is not None else ''),
+                  file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(sizes, repeat=1, trace_memory=True, workdir=None, seed=0):
+    profile = synth.fit_profile()
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = workdir or tmp
+        results = []
+        for rows in sizes:
+            results += run_size(rows, workdir, repeat, trace_memory, seed,
+                                profile)
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def summarize(report):
+    """Best-of-repeats wall time and peak memory per (rows, stage)."""
+    frame = pd.DataFrame(report['results'])
+    return frame.groupby(['rows', 'stage'], sort=False).agg(
+        wall_s=('wall_s', 'min'), peak_mib=('peak_mib', 'max'))
+
+
+def compare(old_path, new_path):
+    """Ratio new/old of wall time and peak memory per (rows, stage)."""
+    with open(old_path) as f:
+        old = summarize(json.load(f))
+    with open(new_path) as f:
+        new = summarize(json.load(f))
+    table = old.join(new, lsuffix='_old', rsuffix='_new', how='inner')
+    table['wall_ratio'] = table['wall_s_new'] / table['wall_s_old']
+    table['peak_ratio'] = table['peak_mib_new'] / table['peak_mib_old']
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    parser.add_argument('--sizes', nargs='+', type=float,
+                        default=[1e4, 1e5, 1e6],
+                        help='row counts to benchmark, e.g. 1e4 1e6 1e8')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip tracemalloc (lower overhead timings)')
+    parser.add_argument('--workdir',
+                        help='keep generated datasets here for reuse')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='result JSON path')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare(*args.compare).to_string())
+        return 0
+
+    report = run([int(s) for s in args.sizes], args.repeat,
+                 not args.no_memory, args.workdir, args.seed)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(summarize(report).to_string())
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
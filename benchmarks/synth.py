@@ -0,0 +1,118 @@
+"""Synthetic abalone datasets with the shape and damage of the real one.
+
+``fit_profile`` learns from ``abalone_growth.csv``: the clean specimens
+(resampled as whole rows, so the correlations between dimensions, weights,
+rings and sex survive) and, per column, how often values are missing or
+negative, how often Height is exactly zero and how often rows repeat.
+``generate`` draws any number of rows from that profile and
+``write_csv`` streams them to disk in chunks, so 10^8-row files can be
+produced without holding them in memory.
+
+    python -m benchmarks.synth 1000000 synthetic_1e6.csv
+"""
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from abalone.columns import AGE_OFFSET, ALL_COLS, NUMERIC_COLS, SEX_COL
+
+SOURCE_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                          'abalone_growth.csv')
+
+# The source has no repeated rows; keep a few so dedup stages have work
+MIN_DUPLICATE_RATE = 0.001
+
+# Relative noise added to resampled measurements
+JITTER = 0.02
+
+
+@dataclass
+class Profile:
+    sex: np.ndarray
+    values: np.ndarray
+    missing_rate: np.ndarray
+    negative_rate: np.ndarray
+    zero_height_rate: float
+    duplicate_rate: float
+
+
+def fit_profile(path=SOURCE_CSV):
+    raw = pd.read_csv(path)
+    values = raw[NUMERIC_COLS].to_numpy(dtype=np.float64)
+    clean = ~np.isnan(values).any(axis=1) & ~(values < 0).any(axis=1)
+    height = values[:, NUMERIC_COLS.index('Height (mm)')]
+    return Profile(
+        sex=raw[SEX_COL].to_numpy(dtype=object)[clean],
+        values=values[clean],
+        missing_rate=np.isnan(values).mean(axis=0),
+        negative_rate=(values < 0).mean(axis=0),
+        zero_height_rate=float((height == 0).mean()),
+        duplicate_rate=max(float(raw.duplicated().mean()), MIN_DUPLICATE_RATE),
+    )
+
+
+def generate(n, profile, rng):
+    """One DataFrame of ``n`` synthetic rows in the source column layout."""
+    pick = rng.integers(len(profile.values), size=n)
+    values = profile.values[pick].copy()
+    sex = profile.sex[pick]
+
+    rings = NUMERIC_COLS.index('Rings')
+    age = NUMERIC_COLS.index('Age (y)')
+    measured = [i for i in range(len(NUMERIC_COLS)) if i not in (rings, age)]
+    values[:, measured] *= 1 + JITTER * rng.standard_normal((n, len(measured)))
+    np.abs(values, out=values)
+    values[:, measured] = np.round(values[:, measured], 4)
+    values[:, age] = values[:, rings] + AGE_OFFSET
+
+    height = NUMERIC_COLS.index('Height (mm)')
+    values[rng.random(n) < profile.zero_height_rate, height] = 0.0
+
+    draws = rng.random(values.shape)
+    values[draws < profile.negative_rate] *= -1
+    missing = rng.random(values.shape) < profile.missing_rate
+    values[missing] = np.nan
+
+    # Replace a few rows with copies of earlier rows in the same chunk
+    source = np.arange(n)
+    dup = np.flatnonzero(rng.random(n) < profile.duplicate_rate)
+    dup = dup[dup > 0]
+    source[dup] = rng.integers(dup)
+    values, sex = values[source], sex[source]
+
+    frame = pd.DataFrame(values, columns=NUMERIC_COLS)
+    frame.insert(0, SEX_COL, sex)
+    return frame[ALL_COLS]
+
+
+def write_csv(path, n, profile=None, chunksize=1_000_000, seed=0):
+    """Stream ``n`` synthetic rows to ``path`` in chunks."""
+    profile = profile or fit_profile()
+    rng = np.random.default_rng(seed)
+    for start in range(0, max(n, 1), chunksize):
+        size = min(chunksize, n - start)
+        generate(size, profile, rng).to_csv(
+            path, mode='w' if start == 0 else 'a', header=start == 0,
+            index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.synth')
+    parser.add_argument('rows', type=float, help='number of rows, e.g. 1e6')
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    write_csv(args.output, int(args.rows), chunksize=args.chunksize,
+              seed=args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import os
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_CSV = os.path.join(ROOT, 'abalone_growth.csv')
+
+
+@pytest.fixture
+def survey_csv(tmp_path):
+    """The first 600 rows of ``abalone_growth.csv`` in a scratch file."""
+    path = tmp_path / 'survey.csv'
+    pd.read_csv(SOURCE_CSV, nrows=600).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def source_csv():
+    return SOURCE_CSV
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from abalone import artifact
+from abalone.model import FEATURE_COLS, fit_csv
+
+
+@pytest.fixture
+def model_artifact(tmp_path, survey_csv):
+    path = artifact.export(fit_csv(survey_csv), str(tmp_path / 'model.bin'))
+    return artifact.ModelArtifact(path)
+
+
+def test_unknown_sex_codes_give_nan(model_artifact):
+    values = np.full((6, len(FEATURE_COLS)), 0.3, dtype=np.float32)
+    codes = np.array([0, 1, 2, -1, 3, 7], dtype=np.intp)
+    ages = model_artifact.kernel(max_batch=8).predict(values, codes)
+    expected = [model_artifact.predict_row([0.3] * len(FEATURE_COLS), s)
+                for s in artifact.SEX_VALUES]
+    np.testing.assert_allclose(ages[:3], expected, rtol=1e-5)
+    assert np.isnan(ages[3:]).all()
+
+
+def test_export_rejects_wrong_array_length(tmp_path, survey_csv,
+                                           monkeypatch):
+    model = fit_csv(survey_csv)
+    monkeypatch.setattr(artifact, 'FEATURE_COLS', FEATURE_COLS[:-1])
+    with pytest.raises(ValueError, match='weights: expected'):
+        artifact.export(model, str(tmp_path / 'model.bin'))
+    assert not list(tmp_path.glob('*.tmp'))
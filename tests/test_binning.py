@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from abalone.binning import Histogram2D
+
+
+def test_histogram2d_merge_adds_counts():
+    a = Histogram2D([0, 1, 2], [0, 1, 2])
+    b = Histogram2D([0, 1, 2], [0, 1, 2])
+    a.update([0.5, 1.5], [0.5, 0.5])
+    b.update([0.5], [0.5])
+    assert a.merge(b).counts.tolist() == [[2, 0], [1, 0]]
+
+
+def test_histogram2d_merge_rejects_different_edges():
+    a = Histogram2D([0, 1, 2], [0, 1, 2])
+    # Same shape, so the counts would otherwise add up silently
+    b = Histogram2D([0, 1, 2], [0, 2, 4])
+    with pytest.raises(ValueError):
+        a.merge(b)
+    assert np.all(a.counts == 0)
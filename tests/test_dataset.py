@@ -0,0 +1,34 @@
+import pandas as pd
+
+from abalone.dataset import PartitionedDataset
+
+
+def row_count(frame):
+    return len(frame)
+
+
+def write_sites(root, survey_csv, files=7):
+    frame = pd.read_csv(survey_csv)
+    for i, part in enumerate(range(0, len(frame), len(frame) // files)):
+        directory = root / f'site=s{i}'
+        directory.mkdir()
+        frame.iloc[part:part + len(frame) // files].to_csv(
+            directory / 'part-0.csv', index=False)
+    return frame
+
+
+def test_parallel_read_keeps_fragment_order(tmp_path, survey_csv):
+    write_sites(tmp_path, survey_csv)
+    serial = PartitionedDataset(tmp_path, max_workers=1)
+    parallel = PartitionedDataset(tmp_path, max_workers=2)
+    pd.testing.assert_frame_equal(parallel.to_frame(), serial.to_frame())
+    assert (list(parallel.map_fragments(row_count))
+            == list(serial.map_fragments(row_count)))
+
+
+def test_iteration_can_stop_after_first_fragment(tmp_path, survey_csv):
+    write_sites(tmp_path, survey_csv)
+    fragments = PartitionedDataset(tmp_path, max_workers=2).iter_fragments()
+    first = next(fragments)
+    fragments.close()
+    assert first['site'].astype(str).unique().tolist() == ['s0']
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from abalone.dedup import DedupIndex, KEY_COLS, find_duplicates
+
+
+def brute_force_near(frame, tolerance):
+    """Earliest earlier row within ``tolerance`` of each row, or -1."""
+    columns = [c for c in frame if c != 'Sex']
+    values = frame[columns].to_numpy(dtype=np.float64)
+    tol = np.array([0.0 if c == 'Rings' else tolerance for c in columns])
+    match = np.full(len(frame), -1)
+    for i in range(len(frame)):
+        for j in range(i):
+            both = np.isnan(values[i]) & np.isnan(values[j])
+            close = (np.abs(values[i] - values[j]) <= tol * (1 + 1e-9)) | both
+            if close.all() and frame['Sex'].iloc[i] == frame['Sex'].iloc[j]:
+                match[i] = j
+                break
+    return match
+
+
+def test_near_duplicates_missing_a_key_column_are_found(source_csv):
+    rng = np.random.default_rng(3)
+    base = pd.read_csv(source_csv, nrows=64).dropna()
+    shifted = base.copy()
+    measurements = [c for c in base if c not in ('Sex', 'Rings', 'Age (y)')]
+    shifted[measurements] += rng.uniform(-5e-4, 5e-4,
+                                         (len(base), len(measurements)))
+    frame = pd.concat([base, shifted], ignore_index=True)
+    frame = frame.drop(columns='Age (y)')
+    # Missing on both rows of every pair, in a different key column each
+    for i in range(len(base)):
+        column = KEY_COLS[i % len(KEY_COLS)]
+        frame.loc[[i, len(base) + i], column] = np.nan
+
+    result = DedupIndex(tolerance=0.001).add(frame)
+    expected = brute_force_near(frame, 0.001)
+    assert np.array_equal(result.match, expected)
+    assert result.duplicated[len(base):].all()
+
+
+def test_missing_key_value_does_not_match_a_present_one(source_csv):
+    frame = pd.read_csv(source_csv, nrows=20).dropna().head(1)
+    frame = pd.concat([frame, frame], ignore_index=True)
+    frame.loc[1, 'Length (mm)'] = np.nan
+    assert find_duplicates(frame).empty
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from abalone import stream
+from abalone.columns import SEX_COL
+from abalone.groupby import aggregate_chunks
+
+COLUMNS = ['Age (y)', 'Whole weight (g)']
+
+
+def test_missing_sex_is_dropped_like_pandas(survey_csv):
+    frame = pd.concat(stream.stream_clean(survey_csv))
+    frame.loc[frame.index[[3, 150, 400]], SEX_COL] = np.nan
+    chunks = [frame.iloc[i:i + 100] for i in range(0, len(frame), 100)]
+    table = aggregate_chunks(chunks).table(['count', 'mean'], COLUMNS)
+    expected = frame.groupby(SEX_COL)[COLUMNS].agg(['count', 'mean'])
+    assert table.index.tolist() == ['F', 'I', 'M']
+    pd.testing.assert_frame_equal(table, expected, check_dtype=False,
+                                  check_index_type=False)
+
+
+def test_relative_percentage_ignores_missing_sex(survey_csv):
+    frame = pd.concat(stream.stream_clean(survey_csv))
+    frame.loc[frame.index[:10], SEX_COL] = np.nan
+    table = aggregate_chunks([frame]).relative_table()
+    counts = frame[SEX_COL].value_counts().sort_index()
+    np.testing.assert_allclose(table['Relative percentage'],
+                               counts / counts.sum() * 100)
+
+
+def test_missing_sex_kept_with_dropna_false(survey_csv):
+    frame = pd.concat(stream.stream_clean(survey_csv))
+    frame.loc[frame.index[:10], SEX_COL] = np.nan
+    table = aggregate_chunks([frame], dropna=False).table(['count'], COLUMNS)
+    assert len(table) == 4
+    assert table[COLUMNS[0], 'count'].sum() == len(frame)
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from abalone.incremental import IncrementalPipeline
+
+
+@pytest.fixture
+def survey(tmp_path, source_csv):
+    """Write rows of the source file to a scratch CSV, return its path."""
+    frame = pd.read_csv(source_csv, nrows=300)
+    path = tmp_path / 'survey.csv'
+
+    def write(rows):
+        frame.iloc[rows].to_csv(path, index=False)
+        return str(path)
+    return write
+
+
+def pipeline(path, cache_dir):
+    return IncrementalPipeline(path, cache_dir=str(cache_dir),
+                               block_rows=100).run()
+
+
+def test_rerun_recomputes_nothing(tmp_path, survey):
+    path = survey(slice(0, 300))
+    pipeline(path, tmp_path / 'cache')
+    again = pipeline(path, tmp_path / 'cache')
+    assert again.counts == {'blocks': 3, 'scanned': 0, 'cleaned': 0,
+                            'summarised': 0}
+
+
+def test_rows_labelled_by_position_after_leading_rows_deleted(tmp_path,
+                                                              survey):
+    cache_dir = tmp_path / 'cache'
+    pipeline(survey(slice(0, 300)), cache_dir)
+    # The two remaining blocks are byte-identical to cached ones
+    path = survey(slice(100, 300))
+    reused = pipeline(path, cache_dir)
+    assert reused.counts['scanned'] == 0
+    fresh = pipeline(path, tmp_path / 'fresh')
+    pd.testing.assert_frame_equal(reused.frame(), fresh.frame())
+    assert reused.frame().index.min() == 0
+    assert reused.frame().index.max() < 200
+
+
+def test_appended_rows_only_reprocess_the_new_block(tmp_path, survey):
+    cache_dir = tmp_path / 'cache'
+    pipeline(survey(slice(0, 200)), cache_dir)
+    grown = pipeline(survey(slice(0, 300)), cache_dir)
+    assert grown.counts['scanned'] == 1
+    fresh = pipeline(survey(slice(0, 300)), tmp_path / 'fresh')
+    pd.testing.assert_frame_equal(grown.frame(), fresh.frame())
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from abalone import outliers, stream
+from abalone.columns import SEX_COL
+from abalone.outliers import MAX_COLUMNS, OutlierDetector
+
+
+@pytest.fixture
+def cleaned(survey_csv):
+    return pd.concat(stream.stream_clean(survey_csv))
+
+
+def test_too_many_columns_are_rejected():
+    columns = [f'c{j}' for j in range(MAX_COLUMNS + 1)]
+    with pytest.raises(ValueError):
+        OutlierDetector(columns=columns)
+
+
+def test_mad_bits_stay_below_fixed_flags(cleaned):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.normal(size=(len(cleaned), MAX_COLUMNS)),
+                         columns=[f'c{j}' for j in range(MAX_COLUMNS)])
+    frame[SEX_COL] = cleaned[SEX_COL].to_numpy()
+    # Far outside on the last column only
+    frame.iloc[:5, MAX_COLUMNS - 1] = 100.0
+    detector = OutlierDetector(columns=list(frame.columns[:-1]),
+                               mahalanobis_q=None).fit_frame(frame)
+    flags = detector.score(frame)
+    last = frame.columns[MAX_COLUMNS - 1]
+    assert (flags[:5] & detector.mad_bit(last)).all()
+    fixed = outliers.MAHALANOBIS | outliers.WEIGHT_RATIO | outliers.ZERO_HEIGHT
+    assert not (flags & np.uint32(fixed)).any()
+    names = detector.flag_names()
+    assert len(names) == 2 * MAX_COLUMNS + 3
+    assert detector.summary(flags)['mahalanobis'] == 0
+
+
+def test_mahalanobis_columns_not_needed_when_disabled(cleaned):
+    frame = cleaned[['Age (y)', 'Rings', SEX_COL]]
+    detector = OutlierDetector(columns=['Age (y)', 'Rings'],
+                               mahalanobis_q=None).fit_frame(frame)
+    flags = detector.score(frame)
+    assert not (flags & np.uint32(outliers.MAHALANOBIS)).any()
+
+
+def test_age_iqr_flags_match_pandas(cleaned):
+    detector = OutlierDetector().fit_frame(cleaned)
+    flagged = detector.score(cleaned) & detector.bit('Age (y)') > 0
+    expected = np.zeros(len(cleaned), bool)
+    for _, group in cleaned.groupby(SEX_COL):
+        age = group['Age (y)']
+        q1, q3 = age.quantile([0.25, 0.75])
+        iqr = q3 - q1
+        outside = (age < q1 - 1.5 * iqr) | (age > q3 + 1.5 * iqr)
+        expected[cleaned.index.get_indexer(group.index[outside])] = True
+    np.testing.assert_array_equal(flagged, expected)
@@ -0,0 +1,30 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from abalone.model import FEATURE_COLS, fit_csv
+from abalone.predict import BatchPredictor, read_batches
+
+
+@pytest.fixture
+def predictor(survey_csv):
+    return BatchPredictor(fit_csv(survey_csv))
+
+
+def test_ndjson_batch_without_a_feature_column(predictor, survey_csv):
+    rows = pd.read_csv(survey_csv, nrows=20).drop(columns='Shell weight (g)')
+    ndjson = io.StringIO(rows.to_json(orient='records', lines=True))
+    batch = next(iter(read_batches(ndjson, fmt='ndjson')))
+    assert 'Shell weight (g)' not in batch
+
+    blank = rows.assign(**{'Shell weight (g)': np.nan})
+    np.testing.assert_allclose(predictor.predict(batch),
+                               predictor.predict(blank[['Sex'] + FEATURE_COLS]))
+    assert not np.isnan(predictor.predict(batch)).any()
+
+
+def test_batch_without_sex_gives_nan(predictor, survey_csv):
+    rows = pd.read_csv(survey_csv, nrows=5).drop(columns='Sex')
+    assert np.isnan(predictor.predict(rows)).all()
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import pytest
+
+from abalone import artifact
+from abalone.model import fit_csv
+from abalone.service import ScoringService
+
+
+@pytest.fixture
+def model_path(tmp_path, survey_csv):
+    return artifact.export(fit_csv(survey_csv), str(tmp_path / 'model.bin'))
+
+
+async def exchange(port, request):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def run(model_path, requests):
+    """Status line and JSON body of each raw request, plus loop errors."""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: errors.append(context))
+        service = ScoringService(model_path)
+        _, port = await service.start(port=0)
+        try:
+            responses = [await exchange(port, r) for r in requests]
+        finally:
+            await service.stop()
+        return responses
+
+    parsed = []
+    for response in asyncio.run(main()):
+        head, _, body = response.partition(b'\r\n\r\n')
+        parsed.append((head.split(b'\r\n')[0].decode(), json.loads(body)))
+    return parsed, errors
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-5', b'1.5'])
+def test_bad_content_length_gets_400(model_path, length):
+    request = (b'POST /predict HTTP/1.1\r\nContent-Length: ' + length
+               + b'\r\nConnection: close\r\n\r\n{}')
+    (response,), errors = run(model_path, [request])
+    assert response == ('HTTP/1.1 400 Bad Request',
+                        {'error': 'bad content-length'})
+    assert errors == []
+
+
+def test_predict(model_path):
+    body = json.dumps({'sex': 'M', 'length_mm': 0.455}).encode()
+    request = (b'POST /predict HTTP/1.1\r\nContent-Length: %d\r\n'
+               b'Connection: close\r\n\r\n' % len(body)) + body
+    ((status, payload),), errors = run(model_path, [request])
+    assert status == 'HTTP/1.1 200 OK'
+    assert isinstance(payload['age'], float)
+    assert errors == []
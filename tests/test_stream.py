@@ -0,0 +1,28 @@
+import pandas as pd
+
+from abalone import stream
+from abalone.columns import DROPNA_COLS, MEAN_FILL_COLS, NUMERIC_COLS
+
+
+def clean_frame(frame):
+    """The notebook cleaning, on the whole frame at once."""
+    frame = frame.dropna(subset=DROPNA_COLS).copy()
+    frame[MEAN_FILL_COLS] = frame[MEAN_FILL_COLS].fillna(
+        frame[MEAN_FILL_COLS].mean())
+    values = frame[NUMERIC_COLS]
+    values = values.mask(values < 0)
+    frame[NUMERIC_COLS] = values.fillna(values.median())
+    return frame
+
+
+def test_chunked_cleaning_matches_whole_frame(survey_csv):
+    expected = clean_frame(pd.read_csv(survey_csv))
+    cleaned = pd.concat(stream.stream_clean(survey_csv, chunksize=97))
+    pd.testing.assert_frame_equal(cleaned, expected)
+
+
+def test_scan_stats_counts_rows(survey_csv):
+    stats = stream.scan_stats(survey_csv, chunksize=97)
+    frame = pd.read_csv(survey_csv)
+    assert stats.rows_read == len(frame)
+    assert stats.rows_kept == len(frame.dropna(subset=DROPNA_COLS))